@@ -0,0 +1,126 @@
+# app/board.py
+"""
+Plansza 5x5 w pamięci i rozstrzyganie gry (bingo / najwięcej pól / remis).
+"""
+from typing import NamedTuple, Optional
+
+BOARD_SIZE = 5
+
+
+class GameResult(NamedTuple):
+    # "bingo", "most_tiles", "draw"
+    win_type: str
+    # zwycięzca; None przy remisie
+    winner_id: Optional[int]
+    # liczba pól zwycięzcy, a przy remisie – liczba pól każdego z liderów
+    tiles: int
+    # przy remisie: gracze z największą liczbą pól
+    leaders: list[int]
+
+
+def _lines(uids: list[Optional[int]], size: int = BOARD_SIZE):
+    rows = [uids[i : i + size] for i in range(0, len(uids), size)]
+    # wiersze
+    yield from rows
+    if len(rows) != size or any(len(r) != size for r in rows):
+        return
+    # kolumny
+    for i in range(size):
+        yield [r[i] for r in rows]
+    # przekątne
+    yield [r[i] for i, r in enumerate(rows)]
+    yield [r[-i - 1] for i, r in enumerate(rows)]
+
+
+def find_bingo(uids: list[Optional[int]]) -> Optional[int]:
+    for line in _lines(uids):
+        s = set(line)
+        if len(s) == 1 and None not in s:
+            return next(iter(s))
+    return None
+
+
+def evaluate(uids: list[Optional[int]]) -> Optional[GameResult]:
+    """Zwraca wynik gry albo None, jeśli gra trwa dalej."""
+    # ===== 1. klasyczne bingo =====
+    winner_id = find_bingo(uids)
+    if winner_id is not None:
+        return GameResult("bingo", winner_id, uids.count(winner_id), [winner_id])
+
+    # ===== 2. brak bingo – plansza jeszcze niepełna =====
+    if not uids or None in uids:
+        return None
+
+    # ===== 3. plansza pełna – najwięcej pól albo remis =====
+    return _most_tiles(uids)
+
+
+def evaluate_final(uids: list[Optional[int]]) -> Optional[GameResult]:
+    """
+    Wynik gry zamykanej przed zapełnieniem planszy (np. po bezczynności):
+    bingo, a jeśli go nie ma – najwięcej zajętych pól albo remis.
+    None, gdy nikt nie zajął żadnego pola.
+    """
+    return evaluate(uids) or _most_tiles(uids)
+
+
+def _most_tiles(uids: list[Optional[int]]) -> Optional[GameResult]:
+    counts: dict[int, int] = {}
+    for uid in uids:
+        if uid is not None:
+            counts[uid] = counts.get(uid, 0) + 1
+    if not counts:
+        return None
+
+    max_count = max(counts.values())
+    leaders = [uid for uid, c in counts.items() if c == max_count]
+    if len(leaders) == 1:
+        return GameResult("most_tiles", leaders[0], max_count, leaders)
+    return GameResult("draw", None, max_count, leaders)
+
+
+
+class BoardState:
+    """
+    Stan planszy jednego pokoju: kolejne pola (assignment id w kolejności id,
+    z task id) i kto je ukończył. version rośnie z każdym przejęciem pola.
+    """
+
+    __slots__ = ("room_id", "asg_ids", "task_ids", "uids", "version", "result")
+
+    def __init__(
+        self,
+        room_id: int,
+        asg_ids: list[int],
+        uids: Optional[list[Optional[int]]] = None,
+        task_ids: Optional[list[int]] = None,
+    ):
+        self.room_id = room_id
+        self.asg_ids = asg_ids
+        self.task_ids = task_ids if task_ids is not None else [0] * len(asg_ids)
+        self.uids: list[Optional[int]] = uids if uids is not None else [None] * len(asg_ids)
+        self.version = sum(1 for uid in self.uids if uid is not None)
+        self.result: Optional[GameResult] = evaluate(self.uids) if self.version else None
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def claim(self, asg_id: int, uid: int) -> bool:
+        """Zaznacza pole; False jeśli pole nie istnieje, jest zajęte albo gra skończona."""
+        if self.result is not None:
+            return False
+        try:
+            idx = self.asg_ids.index(asg_id)
+        except ValueError:
+            return False
+        if self.uids[idx] is not None:
+            return False
+        self.uids[idx] = uid
+        self.version += 1
+        self.result = evaluate(self.uids)
+        return True
+
+    def rows(self) -> list[tuple]:
+        """(assignment_id, task_id, finishing_uid) jak board_rows w rooms.py."""
+        return list(zip(self.asg_ids, self.task_ids, self.uids))
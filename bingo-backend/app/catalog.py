@@ -0,0 +1,69 @@
+# app/catalog.py
+"""
+Katalog zadań w pamięci.
+
+Tabela tasks jest wypełniana raz (seed w models.insert_data) i potem się nie
+zmienia, więc trzymamy ją w procesie: losowanie planszy przy tworzeniu pokoju
+i opisy pól na planszy nie potrzebują zapytań do tasks.
+"""
+import random
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class TaskCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._descriptions: dict[int, str] = {}
+        self._by_category: dict[str, list[int]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+    # ===== ładowanie =====
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self._load(db.execute(_catalog_query()).all())
+
+    async def ensure_loaded_async(self, db: AsyncSession) -> None:
+        if not self._loaded:
+            self._load((await db.execute(_catalog_query())).all())
+
+    def _load(self, rows) -> None:
+        descriptions: dict[int, str] = {}
+        by_category: dict[str, list[int]] = {}
+        for task_id, description, category in rows:
+            descriptions[task_id] = description
+            by_category.setdefault(category, []).append(task_id)
+        with self._lock:
+            self._descriptions = descriptions
+            self._by_category = by_category
+            self._loaded = True
+
+    # ===== odczyt =====
+
+    def description(self, task_id: int) -> str:
+        return self._descriptions[task_id]
+
+    def sample(self, category: str, k: int) -> list[int]:
+        """Losowe, różne id zadań z kategorii (mniej, jeśli kategoria jest mniejsza)."""
+        ids = self._by_category.get(category, [])
+        return random.sample(ids, min(k, len(ids)))
+
+
+def _catalog_query():
+    return select(models.Task.id, models.Task.description, models.Task.category)
+
+
+task_catalog = TaskCatalog()
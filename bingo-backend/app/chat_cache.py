@@ -0,0 +1,198 @@
+# app/chat_cache.py
+"""
+Bufor ostatnich wiadomości każdego aktywnego pokoju (ring buffer w pamięci).
+
+Większość odczytów czatu potrzebuje tylko końcówki rozmowy – serwujemy ją
+stąd bez czytania tabeli messages. Bufor pokoju jest ładowany leniwie przy
+pierwszym odczycie i dopisywany przy send_message. Łączna liczba wiadomości
+jest ograniczona – nieużywane pokoje wylatują według LRU.
+
+Bufor jest osobny w każdym procesie i nie widzi wiadomości wysłanych przez
+inne workery. Dlatego każdy bufor pamięta rooms.message_count, do którego
+jest aktualny: sync() z licznikiem z wiersza pokoju (odczytywanego i tak
+przez endpointy czatu) wyrzuca bufor, gdy baza zna więcej wiadomości,
+a append() – gdy licznik przeskoczył o więcej niż jedną.
+"""
+from collections import OrderedDict, deque
+import threading
+from typing import Iterable, Optional
+
+# ile ostatnich wiadomości trzymamy na pokój
+ROOM_BUFFER_SIZE = 100
+# łączny limit wiadomości we wszystkich buforach
+MAX_CACHED_MESSAGES = 200_000
+
+
+class CachedMessage:
+    __slots__ = ("id", "user_id", "username", "content", "created_at")
+
+    def __init__(self, id: int, user_id: int, username, content: str, created_at: str):
+        self.id = id
+        self.user_id = user_id
+        self.username = username
+        self.content = content
+        # już sformatowany znacznik czasu (jak w MessageOut)
+        self.created_at = created_at
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "username": self.username,
+            "content": self.content,
+            "created_at": self.created_at,
+        }
+
+
+class _RoomBuffer:
+    __slots__ = ("messages", "loaded", "complete", "count")
+
+    def __init__(self, size: int):
+        self.messages: deque = deque(maxlen=size)
+        # False – w buforze są tylko wiadomości dopisane przed pierwszym załadowaniem
+        self.loaded = False
+        # True – bufor zawiera całą historię pokoju (nic starszego w bazie)
+        self.complete = False
+        # rooms.message_count, do którego bufor jest aktualny
+        self.count = 0
+
+
+class RecentMessages:
+    def __init__(self, room_size: int = ROOM_BUFFER_SIZE, max_messages: int = MAX_CACHED_MESSAGES):
+        self.room_size = room_size
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._rooms: "OrderedDict[int, _RoomBuffer]" = OrderedDict()
+        self._total = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    # ===== odczyt =====
+
+    def sync(self, room_id: int, count: int) -> None:
+        """Wyrzuca bufor, jeśli baza zna więcej wiadomości pokoju (rooms.message_count)."""
+        with self._lock:
+            buf = self._rooms.get(room_id)
+            if buf is not None and buf.loaded and buf.count < count:
+                # dopisał je inny worker; opóźniona replika da najwyżej mniejszy licznik
+                self._drop(room_id)
+
+    def latest(self, room_id: int, limit: Optional[int]) -> Optional[list[dict]]:
+        """
+        Ostatnie `limit` wiadomości (None – cała historia) rosnąco po id albo
+        None – trzeba iść do bazy.
+        """
+        with self._lock:
+            buf = self._touch(room_id)
+            if buf is None:
+                return None
+            if limit is None or len(buf.messages) < limit:
+                if not buf.complete:
+                    return None
+                limit = len(buf.messages)
+            msgs = list(buf.messages)[-limit:] if limit < len(buf.messages) else buf.messages
+            return [m.as_dict() for m in msgs]
+
+    def before(self, room_id: int, before_id: int, limit: int) -> Optional[list[dict]]:
+        """`limit` wiadomości starszych niż before_id albo None, jeśli bufor ich nie ma."""
+        with self._lock:
+            buf = self._touch(room_id)
+            if buf is None:
+                return None
+            older = [m for m in buf.messages if m.id < before_id]
+            if len(older) < limit and not buf.complete:
+                return None
+            return [m.as_dict() for m in older[-limit:]]
+
+    def after(self, room_id: int, after_id: int, limit: int) -> Optional[list[dict]]:
+        """Do `limit` wiadomości nowszych niż after_id albo None, jeśli bufor ma lukę."""
+        with self._lock:
+            buf = self._touch(room_id)
+            if buf is None:
+                return None
+            msgs = buf.messages
+            # bufor musi sięgać do after_id, inaczej coś mogło wypaść z ringu
+            if msgs and msgs[0].id > after_id and not buf.complete:
+                return None
+            return [m.as_dict() for m in msgs if m.id > after_id][:limit]
+
+    # ===== zapis =====
+
+    def preload(
+        self, room_id: int, messages: Iterable[CachedMessage], complete: bool, count: int
+    ) -> None:
+        """
+        Ładuje końcówkę historii z bazy (rosnąco po id). count – rooms.message_count
+        odczytany przed wiadomościami, więc bufor nie ma ich mniej, niż licznik mówi.
+        """
+        with self._lock:
+            buf = self._rooms.get(room_id)
+            if buf is not None and buf.loaded:
+                return
+            if buf is None:
+                buf = self._rooms[room_id] = _RoomBuffer(self.room_size)
+            # wiadomości dopisane w trakcie ładowania mogą być nowsze niż odczyt z bazy
+            known = {m.id for m in buf.messages}
+            merged = [m for m in messages if m.id not in known] + list(buf.messages)
+            merged.sort(key=lambda m: m.id)
+            self._total -= len(buf.messages)
+            buf.messages.clear()
+            buf.messages.extend(merged)
+            self._total += len(buf.messages)
+            buf.loaded = True
+            buf.complete = complete and len(merged) <= self.room_size
+            buf.count = max(buf.count, count)
+            self._rooms.move_to_end(room_id)
+            self._evict()
+
+    def append(self, room_id: int, message: CachedMessage, count: int) -> None:
+        """Wiadomość wysłana przez ten proces; count – rooms.message_count po jej zapisie."""
+        with self._lock:
+            buf = self._rooms.get(room_id)
+            if buf is not None and buf.loaded and count != buf.count + 1:
+                # w międzyczasie pisał inny worker – bufor ma lukę
+                self._drop(room_id)
+                return
+            if buf is None:
+                buf = self._rooms[room_id] = _RoomBuffer(self.room_size)
+            buf.count = max(buf.count, count)
+            if len(buf.messages) == buf.messages.maxlen:
+                # najstarsza wypada z ringu – bufor już nie ma całej historii
+                buf.complete = False
+                self._total -= 1
+            buf.messages.append(message)
+            self._total += 1
+            if len(buf.messages) > 1 and buf.messages[-2].id > message.id:
+                # równoległe send_message mogą dopisać się w innej kolejności niż id
+                ordered = sorted(buf.messages, key=lambda m: m.id)
+                buf.messages.clear()
+                buf.messages.extend(ordered)
+            self._rooms.move_to_end(room_id)
+            self._evict()
+
+    def discard(self, room_id: int) -> None:
+        with self._lock:
+            self._drop(room_id)
+
+    # ===== wewnętrzne =====
+
+    def _drop(self, room_id: int) -> None:
+        buf = self._rooms.pop(room_id, None)
+        if buf is not None:
+            self._total -= len(buf.messages)
+
+    def _touch(self, room_id: int) -> Optional[_RoomBuffer]:
+        buf = self._rooms.get(room_id)
+        if buf is None or not buf.loaded:
+            return None
+        self._rooms.move_to_end(room_id)
+        return buf
+
+    def _evict(self) -> None:
+        while self._total > self.max_messages and len(self._rooms) > 1:
+            _room_id, buf = self._rooms.popitem(last=False)
+            self._total -= len(buf.messages)
+
+
+recent_messages = RecentMessages()
@@ -0,0 +1,104 @@
+# app/compression.py
+"""
+Kompresja odpowiedzi negocjowana przez Accept-Encoding (brotli / gzip).
+
+Kompresujemy tylko odpowiedzi wysyłane w jednym kawałku i większe niż
+MINIMUM_SIZE – strumienie (SSE, replay) przechodzą bez zmian.
+"""
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny – bez niego zostaje gzip
+    brotli = None
+
+# mniejszych odpowiedzi nie opłaca się kompresować (nagłówki i tak ważą więcej)
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+# niska jakość brotli – kompresuje lepiej niż gzip 6 i jest tańsza w CPU
+BROTLI_QUALITY = 4
+
+_SKIP_CONTENT_TYPES = ("text/event-stream", "application/x-ndjson", "application/octet-stream")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            accepted[token.lower()] = q
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # wstrzymujemy nagłówki, dopóki nie zobaczymy ciała
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or content_type.startswith(_SKIP_CONTENT_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
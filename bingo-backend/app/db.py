@@ -1,25 +1,182 @@
 # app/db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from collections import OrderedDict
+import itertools
+import os
+import threading
+import time
+from typing import Optional
 
-# SQLite w pliku bingo.db w katalogu projektu
-DATABASE_URL = "sqlite:///./bingo.db"
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+
+# SQLite w pliku bingo.db w katalogu projektu (albo np. postgresql://... z env)
+DATABASE_URL = os.getenv("BINGO_DATABASE_URL", "sqlite:///./bingo.db")
+# repliki tylko do odczytu, adresy po przecinku, np.
+# BINGO_READ_REPLICAS=sqlite:///./replica1.db,sqlite:///./replica2.db
+READ_REPLICA_URLS = [
+    u.strip() for u in os.getenv("BINGO_READ_REPLICAS", "").split(",") if u.strip()
+]
+# przez tyle sekund po własnym zapisie użytkownik czyta z primary (read-your-writes)
+REPLICA_STICKY_SECONDS = float(os.getenv("BINGO_REPLICA_STICKY_SECONDS", "5"))
+# ilu ostatnich piszących pamiętamy
+MAX_RECENT_WRITERS = 100_000
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_url(url: str) -> str:
+    """Ten sam adres bazy ze sterownikiem async."""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _connect_args(url: str) -> dict:
+    # check_same_thread=False jest wymagane przy SQLite + FastAPI
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+# ta sama baza przez sterownik async – dla endpointów async def
+ASYNC_DATABASE_URL = async_url(DATABASE_URL)
 
-# check_same_thread=False jest wymagane przy SQLite + FastAPI
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
+    connect_args=_connect_args(DATABASE_URL),
     future=True,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, future=True)
+
+replica_engines = [
+    create_engine(url, connect_args=_connect_args(url), future=True)
+    for url in READ_REPLICA_URLS
+]
+async_replica_engines = [
+    create_async_engine(async_url(url), future=True) for url in READ_REPLICA_URLS
+]
+
+# expire_on_commit=False – po commicie nie ma lazy-loadów (w async ich nie wolno)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
+# ===== repliki do odczytu =====
+
+class _RecentWriters:
+    """user_id -> moment, do którego jego odczyty idą na primary."""
+
+    def __init__(self, window: float, max_users: int):
+        self.window = window
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._until: "OrderedDict[int, float]" = OrderedDict()
+
+    def mark(self, user_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._until.pop(user_id, None)
+            self._until[user_id] = now + self.window
+            # okno jest stałe, więc na początku są zawsze najstarsze wpisy
+            while self._until and (
+                next(iter(self._until.values())) < now or len(self._until) > self.max_users
+            ):
+                self._until.popitem(last=False)
+
+    def is_recent(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+recent_writers = _RecentWriters(REPLICA_STICKY_SECONDS, MAX_RECENT_WRITERS)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session: Session) -> None:
+    # get_current_user zapisuje user_id w session.info
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        recent_writers.mark(user_id)
+
+
+class _ReadRoutingSession(Session):
+    """
+    Sesja do odczytu: wybiera replikę przy pierwszym zapytaniu. Primary,
+    gdy replik nie ma, gdy użytkownik (session.info["user_id"]) niedawno
+    coś zapisał, albo dla INSERT/UPDATE/DELETE i flush.
+    """
+
+    primary = None
+    replicas: list = []
+    _next_replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            return self.primary
+        bind = self.info.get("bind")
+        if bind is None:
+            if not self.replicas or recent_writers.is_recent(self.info.get("user_id")):
+                bind = self.primary
+            else:
+                bind = next(self._next_replica)
+            self.info["bind"] = bind
+        return bind
+
+
+class _SyncReadSession(_ReadRoutingSession):
+    primary = engine
+    replicas = replica_engines
+    _next_replica = itertools.cycle(replica_engines)
+
+
+class _AsyncReadSession(_ReadRoutingSession):
+    # AsyncSession deleguje do sesji synchronicznej – ta widzi sync_engine
+    primary = async_engine.sync_engine
+    replicas = [e.sync_engine for e in async_replica_engines]
+    _next_replica = itertools.cycle(replicas)
+
+
+ReadSessionLocal = sessionmaker(class_=_SyncReadSession, autoflush=False)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=_AsyncReadSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_read_async_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
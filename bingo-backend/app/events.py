@@ -0,0 +1,135 @@
+# app/events.py
+"""
+Dziennik zdarzeń gry: dopisywanie w transakcji zmiany, odtwarzanie planszy
+i serializacja zdarzeń (NDJSON albo upakowane rekordy binarne).
+"""
+import struct
+import time
+from typing import Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .board import BoardState
+
+EVENT_JOIN = 1
+EVENT_CLAIM = 2
+EVENT_END = 3
+
+EVENT_NAMES = {EVENT_JOIN: "join", EVENT_CLAIM: "claim", EVENT_END: "end"}
+
+# seq u32, ts i64 (ms), kind u8, user_id u32, asg_id u32 – 21 bajtów; 0 = brak
+EVENT_RECORD = struct.Struct("<IqBII")
+
+REPLAY_BATCH = 1000
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def append_event(
+    room_id: int,
+    kind: int,
+    user_id: Optional[int] = None,
+    asg_id: Optional[int] = None,
+):
+    """
+    INSERT z kolejnym numerem seq wyliczonym w tym samym zapytaniu.
+    Wykonuj w transakcji, która wprowadza zmianę – zdarzenie i zmiana
+    zapisują się razem albo wcale – i po zablokowaniu wiersza pokoju
+    (SELECT ... FOR UPDATE albo warunkowy UPDATE rooms): inaczej dwie
+    transakcje na Postgresie wezmą ten sam seq.
+    """
+    next_seq = (
+        select(func.coalesce(func.max(models.GameEvent.seq), 0) + 1)
+        .where(models.GameEvent.room_id == room_id)
+        .scalar_subquery()
+    )
+    return insert(models.GameEvent).values(
+        room_id=room_id,
+        seq=next_seq,
+        ts=now_ms(),
+        kind=kind,
+        user_id=user_id,
+        asg_id=asg_id,
+    )
+
+
+def events_query(room_id: int, after_seq: int = 0, limit: int = REPLAY_BATCH):
+    return (
+        select(
+            models.GameEvent.seq,
+            models.GameEvent.ts,
+            models.GameEvent.kind,
+            models.GameEvent.user_id,
+            models.GameEvent.asg_id,
+        )
+        .where(models.GameEvent.room_id == room_id, models.GameEvent.seq > after_seq)
+        .order_by(models.GameEvent.seq)
+        .limit(limit)
+    )
+
+
+def event_dict(seq, ts, kind, user_id, asg_id) -> dict:
+    return {
+        "seq": seq,
+        "ts": ts,
+        "kind": EVENT_NAMES.get(kind, kind),
+        "user_id": user_id,
+        "asg_id": asg_id,
+    }
+
+
+def pack_event(seq, ts, kind, user_id, asg_id) -> bytes:
+    return EVENT_RECORD.pack(seq, ts, kind, user_id or 0, asg_id or 0)
+
+
+
+async def rebuild_board(db: AsyncSession, room_id: int) -> Optional[BoardState]:
+    """
+    Odtwarza stan planszy z dziennika (zimny odczyt, np. po restarcie procesu).
+    None dla pokoju sprzed dziennika: każde miejsce (allocate_seat) dopisuje
+    EVENT_JOIN, więc mniej wejść niż członków znaczy, że część historii jest
+    tylko w room_members i task_assignments.
+    """
+    joins, members = (
+        await db.execute(
+            select(
+                select(func.count())
+                .where(models.GameEvent.room_id == room_id, models.GameEvent.kind == EVENT_JOIN)
+                .scalar_subquery(),
+                select(func.count(models.RoomMember.id))
+                .where(models.RoomMember.room_id == room_id)
+                .scalar_subquery(),
+            )
+        )
+    ).one()
+    if joins < members:
+        return None
+
+    tiles = (
+        await db.execute(
+            select(models.TaskAssignment.id, models.TaskAssignment.task_id)
+            .where(models.TaskAssignment.room_id == room_id)
+            .order_by(models.TaskAssignment.id)
+        )
+    ).all()
+    board = BoardState(
+        room_id,
+        [asg_id for asg_id, _ in tiles],
+        task_ids=[task_id for _, task_id in tiles],
+    )
+
+    claims = await db.execute(
+        select(models.GameEvent.user_id, models.GameEvent.asg_id)
+        .where(
+            models.GameEvent.room_id == room_id,
+            models.GameEvent.kind == EVENT_CLAIM,
+        )
+        .order_by(models.GameEvent.seq)
+    )
+    for user_id, asg_id in claims:
+        board.claim(asg_id, user_id)
+    return board
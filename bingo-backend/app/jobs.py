@@ -0,0 +1,226 @@
+# app/jobs.py
+"""
+Trwała kolejka zadań w tle w tabeli jobs, obsługiwana przez wątek w procesie.
+
+- enqueue() dopisuje zadanie w transakcji wywołującego – zadanie istnieje
+  wtedy i tylko wtedy, gdy zmiana, która je wywołała, została zapisana.
+  Drugi enqueue z tym samym kluczem nic nie robi (idempotencja).
+- JobWorker przejmuje zadanie warunkowym UPDATE (kilka procesów może działać
+  naraz), a handler i oznaczenie "done" idą w jednej transakcji – efekt
+  w bazie jest dokładnie jeden nawet przy ponowieniach. "done" zapisuje tylko
+  worker, który nadal trzyma dzierżawę; inaczej handler się wycofuje.
+- Błąd -> ponowienie z wykładniczym opóźnieniem, po MAX_ATTEMPTS "failed".
+  Zadanie porzucone przez martwy proces wraca po wygaśnięciu dzierżawy.
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+from typing import Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import SessionLocal, engine
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 1.0
+# po tylu sekundach "running" zadanie może przejąć inny worker
+LEASE_SECONDS = 60
+# awaryjne odpytywanie – normalnie worker budzi notify()
+POLL_SECONDS = 1.0
+
+logger = logging.getLogger("uvicorn.error")
+
+_handlers: dict[str, Callable[[Session, dict], None]] = {}
+
+
+def job_handler(kind: str):
+    """Rejestruje funkcję (db, payload) obsługującą zadania danego rodzaju."""
+
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+
+    return register
+
+
+def enqueue(kind: str, key: str, payload: dict):
+    """
+    Instrukcja INSERT dla zadania – wykonaj ją w swojej transakcji
+    (db.execute), a po commicie zawołaj job_worker.notify().
+    """
+    insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+    return (
+        insert(models.Job)
+        .values(kind=kind, key=key, payload=json.dumps(payload), status="pending",
+                attempts=0, run_after=datetime.utcnow(), created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+
+
+class JobWorker:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        # ostatnie opóźnienie od dopisania do wykonania (s)
+        self.last_lag = 0.0
+
+    # ===== cykl życia =====
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    # ===== pętla =====
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                worked = self.run_once()
+            except Exception:
+                logger.exception("Job worker iteration failed")
+                worked = False
+            if not worked:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """Wykonuje jedno zadanie. False, jeśli nie było nic do zrobienia."""
+        with self.session_factory() as db:
+            job = self._claim(db)
+            if job is None:
+                return False
+            job_id, kind, key, payload, attempts, created_at, lease = job
+
+            try:
+                handler = _handlers[kind]
+                handler(db, json.loads(payload))
+                done = db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job_id, models.Job.status == "running",
+                           models.Job.run_after == lease)
+                    .values(status="done", finished_at=datetime.utcnow(), last_error=None)
+                )
+                if done.rowcount == 0:
+                    # dzierżawa wygasła i zadanie przejął inny worker – jego wynik się liczy
+                    db.rollback()
+                    logger.warning("Job %s lost its lease, discarding this run", key)
+                    return True
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._failed(db, job_id, key, attempts, lease, e)
+                return True
+
+            self.processed += 1
+            self.last_lag = (datetime.utcnow() - created_at).total_seconds()
+            return True
+
+    def _claim(self, db: Session):
+        now = datetime.utcnow()
+        candidate = db.execute(
+            select(
+                models.Job.id, models.Job.kind, models.Job.key, models.Job.payload,
+                models.Job.attempts, models.Job.created_at, models.Job.run_after,
+            )
+            .where(models.Job.status.in_(("pending", "running")), models.Job.run_after <= now)
+            .order_by(models.Job.id)
+            .limit(1)
+        ).first()
+        if candidate is None:
+            db.rollback()
+            return None
+
+        job_id, kind, key, payload, attempts, created_at, run_after = candidate
+        # warunek na run_after: jeśli ktoś przejął zadanie przed nami, nic nie zmienimy
+        lease = now + timedelta(seconds=LEASE_SECONDS)
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.run_after == run_after,
+                   models.Job.status.in_(("pending", "running")))
+            .values(status="running", attempts=attempts + 1, run_after=lease)
+        )
+        db.commit()
+        if claimed.rowcount == 0:
+            return None
+        return job_id, kind, key, payload, attempts + 1, created_at, lease
+
+    def _failed(
+        self, db: Session, job_id: int, key: str, attempts: int, lease: datetime, error: Exception
+    ) -> None:
+        if attempts >= MAX_ATTEMPTS:
+            values = {"status": "failed", "finished_at": datetime.utcnow()}
+            self.failed += 1
+            logger.error("Job %s failed after %d attempts: %r", key, attempts, error)
+        else:
+            delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            values = {"status": "pending", "run_after": datetime.utcnow() + timedelta(seconds=delay)}
+            self.retried += 1
+            logger.warning("Job %s attempt %d failed, retry in %.0f s: %r", key, attempts, delay, error)
+        # jak przy "done" – zadanie przejęte przez inny worker zostawiamy jemu
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == "running",
+                   models.Job.run_after == lease)
+            .values(last_error=repr(error)[:500], **values)
+        )
+        db.commit()
+
+    # ===== metryki =====
+
+    def metrics(self) -> dict:
+        with self.session_factory() as db:
+            depth = {
+                (status, kind): n
+                for status, kind, n in db.execute(
+                    select(models.Job.status, models.Job.kind, func.count())
+                    .where(models.Job.status != "done")
+                    .group_by(models.Job.status, models.Job.kind)
+                )
+            }
+            oldest = db.execute(
+                select(func.min(models.Job.created_at)).where(models.Job.status == "pending")
+            ).scalar()
+
+        return {
+            "pending": sum(n for (status, _), n in depth.items() if status == "pending"),
+            "running": sum(n for (status, _), n in depth.items() if status == "running"),
+            "failed": sum(n for (status, _), n in depth.items() if status == "failed"),
+            "by_kind": [
+                {"status": status, "kind": kind, "count": n}
+                for (status, kind), n in sorted(depth.items())
+            ],
+            "oldest_pending_seconds": (
+                round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0
+            ),
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed_total": self.failed,
+            "last_lag_seconds": round(self.last_lag, 3),
+            "worker_alive": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+job_worker = JobWorker()
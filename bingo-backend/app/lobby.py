@@ -0,0 +1,239 @@
+# app/lobby.py
+"""
+Stan lobby trzymany w pamięci + kanał Server-Sent Events dla listy pokoi.
+
+Lobby zna tylko pokoje, które jeszcze się nie skończyły. Każda zmiana
+(nowy pokój, zmiana liczby graczy, koniec gry) jest serializowana dokładnie
+raz, a gotowe bajty trafiają do kolejek wszystkich obserwatorów.
+"""
+import asyncio
+import json
+import threading
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+
+# ile zdarzeń może czekać na wolnego klienta, zanim go rozłączymy
+SUBSCRIBER_QUEUE_SIZE = 256
+# co ile sekund wysyłamy komentarz podtrzymujący połączenie
+KEEPALIVE_SECONDS = 15.0
+
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class _Subscriber:
+    __slots__ = ("loop", "queue")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class Lobby:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms: dict[int, dict] = {}
+        self._loaded = False
+        # pokoje zakończone w trakcie pierwszego ładowania – odczyt z bazy mógł ich nie widzieć
+        self._finished_while_loading: set[int] = set()
+        self._seq = 0
+        self._snapshot: Optional[bytes] = None
+        self._subscribers: set[_Subscriber] = set()
+        # indeks do szybkiego dołączania: kategoria -> wolne miejsca -> {room_id: None}
+        # (tylko pokoje bez hasła, z co najmniej jednym wolnym miejscem)
+        self._open: dict[str, dict[int, dict[int, None]]] = {}
+
+    # ===== ładowanie =====
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+
+        counts = (
+            db.query(models.RoomMember.room_id, func.count(models.RoomMember.id))
+            .group_by(models.RoomMember.room_id)
+            .subquery()
+        )
+        rows = (
+            db.query(models.Room, counts.c[1])
+            .outerjoin(counts, counts.c.room_id == models.Room.id)
+            .filter(models.Room.done.is_(False))
+            .all()
+        )
+
+        with self._lock:
+            if self._loaded:
+                return
+            for room, players_count in rows:
+                # zdarzenia, które przyszły w trakcie ładowania, są nowsze niż odczyt
+                if room.id not in self._rooms and room.id not in self._finished_while_loading:
+                    self._rooms[room.id] = _room_dict(room, players_count or 0)
+                    self._index(self._rooms[room.id])
+            self._finished_while_loading.clear()
+            self._loaded = True
+            self._snapshot = None
+
+    # ===== odczyt =====
+
+    def rooms(self) -> list[dict]:
+        with self._lock:
+            return [dict(r) for r in self._rooms.values()]
+
+    def pick_open_room(self, category: str, exclude=()) -> Optional[int]:
+        """
+        Pokój bez hasła z wolnym miejscem; najpierw najbardziej zapełnione,
+        żeby gry startowały szybciej. Koszt nie zależy od liczby pokoi.
+        """
+        with self._lock:
+            buckets = self._open.get(category)
+            if not buckets:
+                return None
+            for free in sorted(buckets):
+                for room_id in buckets[free]:
+                    if room_id not in exclude:
+                        return room_id
+            return None
+
+    def snapshot(self) -> bytes:
+        with self._lock:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> bytes:
+        # snapshot serializujemy raz i trzymamy aż do następnej zmiany
+        if self._snapshot is None:
+            self._snapshot = _sse(
+                "snapshot", {"rooms": list(self._rooms.values())}, self._seq
+            )
+        return self._snapshot
+
+    # ===== zmiany stanu =====
+
+    def room_created(self, room: models.Room, players_count: int) -> None:
+        data = _room_dict(room, players_count)
+        with self._lock:
+            old = self._rooms.get(room.id)
+            if old is not None:
+                self._unindex(old)
+            self._rooms[room.id] = data
+            self._index(data)
+            self._publish("room-created", data)
+
+    def players_changed(self, room_id: int, players_count: int) -> None:
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None or room["players_count"] == players_count:
+                return
+            self._unindex(room)
+            room["players_count"] = players_count
+            self._index(room)
+            self._publish(
+                "player-count-changed", {"id": room_id, "players_count": players_count}
+            )
+
+    def room_finished(self, room_id: int, winner_uid: Optional[int]) -> None:
+        with self._lock:
+            room = self._rooms.pop(room_id, None)
+            if not self._loaded:
+                self._finished_while_loading.add(room_id)
+            elif room is None:
+                return
+            if room is not None:
+                self._unindex(room)
+            self._publish("room-finished", {"id": room_id, "winner_uid": winner_uid})
+
+    def _index(self, room: dict) -> None:
+        free = room["max_players"] - room["players_count"]
+        if room["has_password"] or free <= 0:
+            return
+        buckets = self._open.setdefault(room["category"], {})
+        buckets.setdefault(free, {})[room["id"]] = None
+
+    def _unindex(self, room: dict) -> None:
+        buckets = self._open.get(room["category"])
+        if not buckets:
+            return
+        free = room["max_players"] - room["players_count"]
+        bucket = buckets.get(free)
+        if bucket is not None:
+            bucket.pop(room["id"], None)
+            if not bucket:
+                del buckets[free]
+
+    def _publish(self, event: str, data: dict) -> None:
+        # wywoływane pod self._lock – jedna serializacja na zdarzenie
+        self._seq += 1
+        self._snapshot = None
+        payload = _sse(event, data, self._seq)
+        for sub in list(self._subscribers):
+            try:
+                sub.loop.call_soon_threadsafe(_deliver, self, sub, payload)
+            except RuntimeError:
+                # pętla zdarzeń już zamknięta
+                self._subscribers.discard(sub)
+
+    def _drop(self, sub: _Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    # ===== SSE =====
+
+    async def stream(self):
+        sub = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            # snapshot i zapis do subskrybentów pod jednym lockiem – bez dziur i duplikatów
+            self._subscribers.add(sub)
+            first = self._snapshot_locked()
+        try:
+            yield first
+            while True:
+                try:
+                    payload = await asyncio.wait_for(
+                        sub.queue.get(), timeout=KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if payload is None:
+                    # klient nie nadążał – niech się połączy ponownie i weźmie snapshot
+                    break
+                yield payload
+        finally:
+            self._drop(sub)
+
+
+def _deliver(lobby: Lobby, sub: _Subscriber, payload: bytes) -> None:
+    try:
+        sub.queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        lobby._drop(sub)
+        # miejsce na znacznik końca
+        sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+
+def _room_dict(room: models.Room, players_count: int) -> dict:
+    return {
+        "id": room.id,
+        "name": room.name,
+        "category": room.category,
+        "has_password": bool(room.password_hash),
+        "max_players": room.max_players,
+        "players_count": players_count,
+    }
+
+
+lobby = Lobby()
@@ -1,13 +1,43 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .db import Base, engine
-from .routers import auth, rooms, chat, profile
+from .compression import CompressionMiddleware
+from .db import async_engine
+from .jobs import job_worker
+from .profiling import ProfilingMiddleware
+from .ratelimit import ConcurrencyLimitMiddleware
+from .reaper import room_reaper
+from .routers import auth, rooms, chat, profile, moderation, health, admin
+from .startup import warm_up
+from .tracing import TracingMiddleware, tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # /readyz zwraca 503, dopóki rozgrzewka się nie skończy
+    app.state.ready = False
+    app.state.warm_up_ms = await warm_up()
+    tracer.start()
+    job_worker.start()
+    room_reaper.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    room_reaper.stop()
+    job_worker.stop()
+    await async_engine.dispose()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Bingo API")
+app = FastAPI(title="Bingo API", lifespan=lifespan)
 
+# ostatni dodany middleware jest najbardziej zewnętrzny:
+# CORS -> śledzenie -> limit -> kompresja -> profiler
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(TracingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # na dev potem ogarniemy
@@ -20,3 +50,6 @@ app.include_router(auth.router)
 app.include_router(rooms.router)
 app.include_router(chat.router)
 app.include_router(profile.router)
+app.include_router(moderation.router)
+app.include_router(health.router)
+app.include_router(admin.router)
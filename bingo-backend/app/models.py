@@ -6,8 +6,13 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     CheckConstraint,
+    UniqueConstraint,
     event,
     Boolean,
+    BigInteger,
+    SmallInteger,
+    Text,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from .db import Base
@@ -52,6 +57,9 @@ class Room(Base):
     max_players = Column(Integer, default=5, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     done = Column(Boolean, default=False, nullable=False)
+    # liczba wiadomości czatu – po niej bufory w innych workerach poznają,
+    # że są nieaktualne (app.chat_cache)
+    message_count = Column(Integer, server_default="0", nullable=False)
 
     # zwycięzca bingo (id użytkownika), None – jeszcze nikt nie wygrał
     winner_uid = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -80,6 +88,11 @@ class Room(Base):
 
 class RoomMember(Base):
     __tablename__ = "room_members"
+    # gracz raz w pokoju, kolor unikalny w pokoju (NULL-e się nie liczą)
+    __table_args__ = (
+        UniqueConstraint("room_id", "user_id", name="uq_room_members_room_user"),
+        UniqueConstraint("room_id", "color", name="uq_room_members_room_color"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
@@ -95,6 +108,8 @@ class RoomMember(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # czat pokoju od końca i ostatnia aktywność pokoju (app.reaper)
+    __table_args__ = (Index("ix_messages_room_id_id", "room_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
@@ -149,3 +164,62 @@ class TaskAssignment(Base):
     finishing_uid = Column(Integer, ForeignKey("users.id"), nullable=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=True)
+
+
+class GameEvent(Base):
+    """
+    Dziennik zdarzeń gry (tylko dopisywanie): wejścia graczy, przejęcia pól,
+    koniec gry. Same liczby + klucz (room_id, seq) bez rowid – wiersz zajmuje
+    kilkanaście bajtów.
+    """
+
+    __tablename__ = "game_events"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    room_id = Column(Integer, ForeignKey("rooms.id"), primary_key=True)
+    # numer zdarzenia w pokoju: 1, 2, 3, ...
+    seq = Column(Integer, primary_key=True)
+    # milisekundy od epoki (UTC)
+    ts = Column(BigInteger, nullable=False)
+    # app.events.EVENT_*
+    kind = Column(SmallInteger, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    asg_id = Column(Integer, nullable=True)
+
+
+class Job(Base):
+    """
+    Trwała kolejka zadań w tle (app.jobs). Zadanie jest dopisywane w tej samej
+    transakcji co zmiana, która je wywołała; `key` chroni przed duplikatami.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # klucz idempotencji, np. "game-stats:42"
+    key = Column(String, nullable=False, unique=True)
+    payload = Column(Text, nullable=False, default="{}")
+    # pending / running / done / failed
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # pending: najwcześniejszy start; running: koniec dzierżawy workera
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class GameArchive(Base):
+    """Podsumowanie zakończonej gry (zapisywane przez zadanie w tle)."""
+
+    __tablename__ = "game_archive"
+
+    room_id = Column(Integer, ForeignKey("rooms.id"), primary_key=True)
+    finished_at = Column(DateTime, nullable=False)
+    category = Column(String, nullable=False)
+    win_type = Column(String, nullable=False)
+    winner_uid = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # JSON: [{"user_id": .., "tiles": ..}, ...] malejąco po liczbie pól
+    players = Column(Text, nullable=False)
@@ -0,0 +1,151 @@
+# app/postgame.py
+"""
+Domknięcie gry poza ścieżką przejęcia pola.
+
+room_finish_task tylko rozstrzyga wynik, ustawia Room.done/winner_uid
+i dopisuje zadania (game_finished_jobs). Resztę robią zadania w tle:
+
+- game.stats – games_played / games_won graczy pokoju,
+- leaderboard.refresh – odświeżenie rankingu w pamięci,
+- game.archive – podsumowanie gry w game_archive, zwolnienie bufora czatu
+  i planszy we współdzielonej pamięci.
+"""
+from datetime import datetime
+import json
+import threading
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .board import evaluate_final
+from .chat_cache import recent_messages
+from .jobs import enqueue, job_handler
+from .shm_board import board_store
+
+LEADERBOARD_SIZE = 100
+# inne procesy nie dostają zadań refresh – odświeżają ranking same, gdy jest starszy
+LEADERBOARD_MAX_AGE_SECONDS = 60
+
+
+def game_finished_jobs(room_id: int, winner_id) -> list:
+    """INSERT-y zadań do wykonania w transakcji kończącej grę."""
+    payload = {"room_id": room_id, "winner_id": winner_id}
+    return [
+        enqueue("game.stats", f"game-stats:{room_id}", payload),
+        enqueue("leaderboard.refresh", f"leaderboard:{room_id}", payload),
+        enqueue("game.archive", f"game-archive:{room_id}", payload),
+    ]
+
+
+@job_handler("game.stats")
+def update_stats(db: Session, payload: dict) -> None:
+    room_id, winner_id = payload["room_id"], payload["winner_id"]
+    players = select(models.RoomMember.user_id).where(models.RoomMember.room_id == room_id)
+    db.execute(
+        update(models.User)
+        .where(models.User.id.in_(players))
+        .values(games_played=models.User.games_played + 1)
+    )
+    if winner_id is not None:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == winner_id)
+            .values(games_won=models.User.games_won + 1)
+        )
+
+
+class Leaderboard:
+    """Najlepsi gracze wg wygranych – liczone w tle, czytane bez bazy."""
+
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._top: list[dict] = []
+        self.refreshed_at = None
+
+    def refresh(self, db: Session) -> None:
+        rows = db.execute(
+            select(
+                models.User.id, models.User.username, models.User.email,
+                models.User.games_won, models.User.games_played,
+            )
+            .where(models.User.games_played > 0)
+            .order_by(models.User.games_won.desc(), models.User.games_played, models.User.id)
+            .limit(self.size)
+        ).all()
+        top = [
+            {
+                "user_id": uid,
+                "username": username or email,
+                "games_won": won,
+                "games_played": played,
+            }
+            for uid, username, email, won, played in rows
+        ]
+        with self._lock:
+            self._top = top
+            self.refreshed_at = datetime.utcnow()
+
+    def ensure_fresh(self, db: Session) -> None:
+        if (
+            self.refreshed_at is None
+            or (datetime.utcnow() - self.refreshed_at).total_seconds() > LEADERBOARD_MAX_AGE_SECONDS
+        ):
+            self.refresh(db)
+
+    def top(self, limit: int) -> list[dict]:
+        with self._lock:
+            return self._top[:limit]
+
+
+leaderboard = Leaderboard()
+
+
+@job_handler("leaderboard.refresh")
+def refresh_leaderboard(db: Session, payload: dict) -> None:
+    # statystyki mogą być jeszcze w kolejce – game.stats ma niższe id, idzie pierwsze
+    leaderboard.refresh(db)
+
+
+@job_handler("game.archive")
+def archive_game(db: Session, payload: dict) -> None:
+    room_id = payload["room_id"]
+    room = db.get(models.Room, room_id)
+    uids = list(
+        db.execute(
+            select(models.TaskAssignment.finishing_uid)
+            .where(models.TaskAssignment.room_id == room_id)
+            .order_by(models.TaskAssignment.id)
+        ).scalars()
+    )
+    result = evaluate_final(uids)
+
+    tiles: dict[int, int] = {}
+    for uid in uids:
+        if uid is not None:
+            tiles[uid] = tiles.get(uid, 0) + 1
+    players = db.execute(
+        select(models.RoomMember.user_id).where(models.RoomMember.room_id == room_id)
+    ).scalars()
+
+    db.merge(
+        models.GameArchive(
+            room_id=room_id,
+            finished_at=datetime.utcnow(),
+            category=room.category,
+            # gra zamknięta (app.reaper), zanim ktokolwiek zajął pole
+            win_type=result.win_type if result else "abandoned",
+            winner_uid=payload["winner_id"],
+            players=json.dumps(
+                sorted(
+                    ({"user_id": uid, "tiles": tiles.get(uid, 0)} for uid in players),
+                    key=lambda p: -p["tiles"],
+                )
+            ),
+        )
+    )
+    # pokój zakończony – jego czat nie musi już siedzieć w pamięci
+    recent_messages.discard(room_id)
+    if board_store is not None:
+        board_store.remove(room_id)
@@ -0,0 +1,156 @@
+# app/profiling.py
+"""
+Profilowanie działającego workera na żądanie (endpointy w routers/admin.py).
+
+- SamplingProfiler – osobny wątek co `interval` odczytuje stosy wszystkich
+  wątków (sys._current_frames) i zlicza je w formacie "collapsed"
+  (flamegraph.pl, speedscope, inferno). Koszt tylko podczas próbkowania.
+- RequestProfiler – cProfile dla kolejnych żądań o ścieżce zaczynającej się
+  od prefiksu. Wyłączony kosztuje jedno sprawdzenie flagi w middleware.
+"""
+import asyncio
+import cProfile
+from collections import Counter
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from typing import Optional
+
+# maksymalna głębokość zapisywanego stosu
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(code, cache: dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)
+        label = cache[code] = f"{name} ({code.co_filename}:{code.co_firstlineno})"
+    return label
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+
+    def sample(self, seconds: float, interval: float) -> Counter:
+        """Próbkuje przez `seconds` (blokująco – wołać w osobnym wątku)."""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("profiler already running")
+            self.running = True
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self.running = False
+
+    def _sample(self, seconds: float, interval: float) -> Counter:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        labels: dict = {}
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame.f_code, labels))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                stack.reverse()
+                stacks[";".join(stack)] += 1
+            time.sleep(interval)
+
+        return stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    cProfile dla żądań pasujących do prefiksu ścieżki, po jednym naraz.
+
+    Profil obejmuje wątek pętli zdarzeń, więc endpointy async def widać
+    w całości; w trakcie await mogą się do niego wmieszać inne korutyny.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.prefix = ""
+        self.remaining = 0
+        self._busy = False
+        self._stats: Optional[pstats.Stats] = None
+        self._done: Optional[asyncio.Event] = None
+
+    def start(self, prefix: str, requests: int) -> asyncio.Event:
+        if self.active:
+            raise RuntimeError("capture already running")
+        self.prefix = prefix
+        self.remaining = requests
+        self._stats = None
+        self._done = asyncio.Event()
+        self.active = True
+        return self._done
+
+    def stop(self) -> Optional[pstats.Stats]:
+        self.active = False
+        if self._done is not None:
+            self._done.set()
+        return self._stats
+
+    def wants(self, path: str) -> bool:
+        return self.active and not self._busy and path.startswith(self.prefix)
+
+    async def run(self, app, scope, receive, send) -> None:
+        self._busy = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await app(scope, receive, send)
+            finally:
+                profile.disable()
+        finally:
+            self._busy = False
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.stop()
+
+
+def stats_text(stats: pstats.Stats, sort: str, limit: int) -> str:
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def stats_dump(stats: pstats.Stats) -> bytes:
+    # ten sam format co cProfile -o / pstats.dump_stats (snakeviz, flameprof)
+    return marshal.dumps(stats.stats)
+
+
+sampling_profiler = SamplingProfiler()
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if request_profiler.active and scope["type"] == "http" and request_profiler.wants(scope["path"]):
+            await request_profiler.run(self.app, scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,146 @@
+# app/ratelimit.py
+"""
+Ograniczanie ruchu: token bucket na użytkownika i globalny limit współbieżności.
+
+- rate_limit(name) – zależność FastAPI; każdy endpoint ma własny budżet
+  (ROUTE_BUDGETS), kubełki kluczowane id użytkownika z get_current_user.
+  Liczba kubełków jest ograniczona – najdawniej używane wylatują (LRU).
+- ConcurrencyLimitMiddleware – gdy w toku jest już MAX_INFLIGHT żądań,
+  kolejne dostają od razu 429 z Retry-After zamiast czekać w kolejce.
+"""
+from collections import OrderedDict
+import math
+import os
+import random
+import threading
+import time
+from typing import Callable
+
+from fastapi import Depends, HTTPException, status
+from starlette.responses import JSONResponse
+
+from . import models
+from .security import get_current_user_async
+
+# nazwa -> (tokeny na sekundę, pojemność kubełka)
+ROUTE_BUDGETS: dict[str, tuple[float, int]] = {
+    # odpytywanie co 2.5 s z kilku kart/urządzeń naraz
+    "list_rooms": (2.0, 10),
+    "room_tasks": (2.0, 10),
+    "room_state": (2.0, 10),
+    "get_messages": (2.0, 10),
+    "send_message": (1.0, 5),
+    "finish_task": (2.0, 10),
+    # paczka do 25 przejęć po powrocie do sieci
+    "claims": (0.5, 3),
+    "join": (1.0, 5),
+    "create_room": (0.2, 3),
+}
+# ilu użytkowników pamiętamy na jeden budżet
+MAX_BUCKETS = 100_000
+# BINGO_RATE_LIMITS=0 wyłącza limity na użytkownika (benchmarki z jednego konta)
+RATE_LIMITS_ENABLED = os.getenv("BINGO_RATE_LIMITS", "1") != "0"
+
+MAX_INFLIGHT = int(os.getenv("BINGO_MAX_INFLIGHT", "256"))
+# strumienie SSE trwają minutami, a sondy nie mogą dostawać 429 – poza limitem
+_INFLIGHT_EXEMPT = ("/rooms/stream", "/healthz", "/readyz")
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int, max_keys: int = MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[int, _Bucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: int) -> float:
+        """Zabiera jeden token. Zwraca 0 albo liczbę sekund do następnego tokenu."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(self.burst, now)
+                if len(self._buckets) > self.max_keys:
+                    # najdawniej używany kubełek i tak zdążył się już napełnić
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / self.rate
+
+
+limiters: dict[str, RateLimiter] = {
+    name: RateLimiter(rate, burst) for name, (rate, burst) in ROUTE_BUDGETS.items()
+}
+
+
+def rate_limit(name: str, user_dependency: Callable = get_current_user_async):
+    """
+    Zależność sprawdzająca budżet `name` dla zalogowanego użytkownika.
+
+    user_dependency powinno być tą samą zależnością, której używa endpoint –
+    FastAPI wywoła ją wtedy raz na żądanie. Może zwracać użytkownika albo
+    samo jego id (get_current_user_id).
+    """
+    limiter = limiters[name]
+
+    async def check(user: models.User = Depends(user_dependency)) -> None:
+        if not RATE_LIMITS_ENABLED:
+            return
+        retry_after = limiter.acquire(getattr(user, "id", user))
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return check
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, app, max_inflight: int = MAX_INFLIGHT):
+        self.app = app
+        self.max_inflight = max_inflight
+        # licznik zmieniany tylko w pętli zdarzeń – bez locka
+        self.inflight = 0
+        self.shed = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_INFLIGHT_EXEMPT):
+            await self.app(scope, receive, send)
+            return
+
+        if self.inflight >= self.max_inflight:
+            self.shed += 1
+            # losowe Retry-After rozprasza klientów, którzy wrócą wszyscy naraz
+            response = JSONResponse(
+                {"detail": "Server busy"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(random.randint(1, 3))},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
@@ -0,0 +1,321 @@
+# app/reaper.py
+"""
+Zamykanie porzuconych pokoi.
+
+Każdy proces trzyma w pamięci otwarte pokoje: czas założenia i ostatniej
+aktywności (przejęcie pola, wiadomość, wejście gracza) oraz kopiec terminów.
+touch() tylko nadpisuje czas w słowniku – termin w kopcu jest sprawdzany
+dopiero, gdy nadejdzie, i wtedy przesuwany (leniwe usuwanie). Na pokój
+przypada jeden wpis w kopcu, więc setki tysięcy pokoi to kilkadziesiąt MB
+i O(log n) na termin.
+
+Pokój wygasa po BINGO_ROOM_IDLE_SECONDS bez aktywności albo po
+BINGO_GAME_MAX_SECONDS od założenia. Przed zamknięciem ostatnia aktywność
+jest sprawdzana w bazie (inne workery, czat) pod blokadą wiersza pokoju –
+decyduje baza, a warunkowy UPDATE sprawia, że pokój zamyka dokładnie jeden
+proces. Pokój, którego nie udało się zamknąć, wraca do kopca.
+
+Zamknięcie idzie jak koniec gry w room_finish_task: wynik z evaluate_final
+(bingo / najwięcej pól / remis, bez zajętych pól – bez zwycięzcy),
+zdarzenie końca, zadania app.postgame i zwolnienie lobby.
+"""
+from datetime import datetime
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .board import evaluate_final
+from .db import SessionLocal
+from .events import EVENT_END, append_event
+from .jobs import job_worker
+from .lobby import lobby
+from .postgame import game_finished_jobs
+
+# 0 wyłącza dany limit; oba 0 – reaper nie startuje
+ROOM_IDLE_SECONDS = int(os.getenv("BINGO_ROOM_IDLE_SECONDS", "1800"))
+GAME_MAX_SECONDS = int(os.getenv("BINGO_GAME_MAX_SECONDS", "21600"))
+# ile pokoi zamykamy w jednym obrocie pętli
+REAPER_BATCH = 200
+# najdłuższy sen pętli – nowe pokoje mogą mieć bliższy termin niż czołowy
+REAPER_TICK_SECONDS = 5.0
+# po błędzie zamykania pokój wraca do kopca z takim opóźnieniem
+REAPER_RETRY_SECONDS = 30.0
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _epoch(dt: datetime) -> float:
+    # daty w bazie są naiwne, w UTC (datetime.utcnow)
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+class RoomReaper:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        idle_seconds: int = ROOM_IDLE_SECONDS,
+        max_seconds: int = GAME_MAX_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.idle_seconds = idle_seconds
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        # room_id -> (założony, ostatnia aktywność), sekundy od epoki
+        self._rooms: dict[int, tuple[float, float]] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.reaped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_seconds > 0 or self.max_seconds > 0
+
+    # ===== śledzenie =====
+
+    def track(self, room_id: int, created_at: datetime) -> None:
+        """Nowy pokój (albo pokój z bazy przy starcie)."""
+        if not self.enabled:
+            return
+        created = _epoch(created_at)
+        self._add(room_id, created, created)
+
+    def touch(self, room_id: int) -> None:
+        """Aktywność w pokoju. Pokoje nieśledzone (skończone) pomijamy."""
+        if not self.enabled:
+            return
+        with self._lock:
+            times = self._rooms.get(room_id)
+            if times is not None:
+                self._rooms[room_id] = (times[0], time.time())
+
+    def forget(self, room_id: int) -> None:
+        # wpis w kopcu zostaje – zniknie, gdy nadejdzie jego termin
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def _add(self, room_id: int, created: float, last: float) -> None:
+        if not self.enabled:
+            return
+        deadline = self._deadline(created, last)
+        with self._lock:
+            known = self._rooms.get(room_id)
+            # wpis w kopcu nie może być późniejszy niż faktyczny termin
+            if known is None or deadline < self._deadline(*known):
+                heapq.heappush(self._heap, (deadline, room_id))
+            self._rooms[room_id] = (created, last)
+
+    def _deadline(self, created: float, last: float) -> float:
+        deadlines = []
+        if self.idle_seconds > 0:
+            deadlines.append(last + self.idle_seconds)
+        if self.max_seconds > 0:
+            deadlines.append(created + self.max_seconds)
+        # oba limity wyłączone – pokój nigdy nie wygasa
+        return min(deadlines, default=math.inf)
+
+    def load(self, db: Session) -> int:
+        """Otwarte pokoje z ostatnią aktywnością z bazy; zwraca ich liczbę."""
+        rows = db.execute(
+            select(
+                models.Room.id,
+                models.Room.created_at,
+                _last_event_ms(models.Room.id),
+                _last_message_at(models.Room.id),
+            ).where(models.Room.done.is_(False))
+        ).all()
+        for room_id, created_at, event_ms, message_at in rows:
+            created = _epoch(created_at)
+            last = max(
+                created,
+                event_ms / 1000 if event_ms else 0,
+                _epoch(message_at) if message_at else 0,
+            )
+            self._add(room_id, created, last)
+        return len(rows)
+
+    # ===== cykl życia =====
+
+    def start(self) -> None:
+        if self._thread is not None or not self.enabled:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="room-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        try:
+            with self.session_factory() as db:
+                logger.info("Room reaper tracking %d open rooms", self.load(db))
+        except Exception:
+            logger.exception("Room reaper failed to load rooms")
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once() >= REAPER_BATCH
+            except Exception:
+                logger.exception("Room reaper iteration failed")
+                busy = False
+            if not busy:
+                self._stop.wait(self._sleep_seconds())
+
+    def _sleep_seconds(self) -> float:
+        with self._lock:
+            if not self._heap:
+                return REAPER_TICK_SECONDS
+            return min(max(self._heap[0][0] - time.time(), 0.05), REAPER_TICK_SECONDS)
+
+    # ===== wygaszanie =====
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """Obsługuje pokoje z minionym terminem. Zwraca ich liczbę."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < REAPER_BATCH:
+                _, room_id = heapq.heappop(self._heap)
+                times = self._rooms.get(room_id)
+                if times is None:
+                    continue
+                deadline = self._deadline(*times)
+                if deadline > now:
+                    # była aktywność od czasu wpisania terminu
+                    heapq.heappush(self._heap, (deadline, room_id))
+                    continue
+                due.append(room_id)
+
+        for room_id in due:
+            try:
+                with self.session_factory() as db:
+                    self._expire(db, room_id, now)
+            except Exception:
+                # jeden zepsuty pokój nie zatrzymuje reszty; spróbujemy ponownie później
+                logger.exception("Room reaper failed to close room %d", room_id)
+                with self._lock:
+                    if room_id in self._rooms:
+                        heapq.heappush(self._heap, (now + REAPER_RETRY_SECONDS, room_id))
+        return len(due)
+
+    def _expire(self, db: Session, room_id: int, now: float) -> None:
+        # blokada wiersza pokoju (Postgres) do końca transakcji, jak w
+        # room_finish_task: przejęcie pola nie wejdzie między sprawdzenie
+        # aktywności, rozstrzygnięcie i zamknięcie pokoju
+        row = db.execute(
+            select(
+                models.Room.done,
+                models.Room.created_at,
+                _last_event_ms(models.Room.id),
+                _last_message_at(models.Room.id),
+            )
+            .where(models.Room.id == room_id)
+            .with_for_update(of=models.Room)
+        ).first()
+        if row is None or row.done:
+            self.forget(room_id)
+            return
+
+        created = _epoch(row.created_at)
+        last = max(
+            created,
+            row[2] / 1000 if row[2] else 0,
+            _epoch(row[3]) if row[3] else 0,
+        )
+        with self._lock:
+            known = self._rooms.get(room_id)
+            if known is not None:
+                last = max(last, known[1])
+            self._rooms[room_id] = (created, last)
+            deadline = self._deadline(created, last)
+            if deadline > now:
+                # aktywność widoczna tylko w bazie (inny worker)
+                heapq.heappush(self._heap, (deadline, room_id))
+                return
+
+        self._finalize(db, room_id)
+        self.forget(room_id)
+
+    def _finalize(self, db: Session, room_id: int) -> None:
+        # wywoływane pod blokadą pokoju z _expire
+        uids = list(
+            db.execute(
+                select(models.TaskAssignment.finishing_uid)
+                .where(models.TaskAssignment.room_id == room_id)
+                .order_by(models.TaskAssignment.id)
+            ).scalars()
+        )
+        result = evaluate_final(uids)
+        winner_id = result.winner_id if result else None
+
+        closed = db.execute(
+            update(models.Room)
+            .where(models.Room.id == room_id, models.Room.done.is_(False))
+            .values(done=True, winner_uid=winner_id)
+        )
+        if closed.rowcount == 0:
+            # zamknął go w międzyczasie ktoś inny
+            db.rollback()
+            return
+        db.execute(append_event(room_id, EVENT_END, winner_id))
+        for job in game_finished_jobs(room_id, winner_id):
+            db.execute(job)
+        db.commit()
+
+        self.reaped += 1
+        job_worker.notify()
+        lobby.room_finished(room_id, winner_id)
+
+    # ===== metryki =====
+
+    def metrics(self) -> dict:
+        with self._lock:
+            next_due = self._heap[0][0] - time.time() if self._heap else None
+            return {
+                "enabled": self.enabled,
+                "tracked_rooms": len(self._rooms),
+                "heap_entries": len(self._heap),
+                "next_due_seconds": round(next_due, 3) if next_due is not None else None,
+                "reaped": self.reaped,
+                "idle_seconds": self.idle_seconds,
+                "max_seconds": self.max_seconds,
+                "worker_alive": self._thread is not None and self._thread.is_alive(),
+            }
+
+
+def _last_event_ms(room_id_column):
+    # znacznik ostatniego zdarzenia: jeden krok wstecz po kluczu (room_id, seq),
+    # a nie max(ts) po wszystkich zdarzeniach pokoju
+    return (
+        select(models.GameEvent.ts)
+        .where(models.GameEvent.room_id == room_id_column)
+        .order_by(models.GameEvent.seq.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _last_message_at(room_id_column):
+    # ostatnia wiadomość = największe id (ix_messages_room_id_id)
+    return (
+        select(models.Message.created_at)
+        .where(models.Message.room_id == room_id_column)
+        .order_by(models.Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+room_reaper = RoomReaper()
@@ -0,0 +1,99 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from ..jobs import job_worker
+from ..profiling import (
+    collapsed,
+    request_profiler,
+    sampling_profiler,
+    stats_dump,
+    stats_text,
+)
+from ..reaper import room_reaper
+from ..security import get_current_admin
+from ..tracing import tracer
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(get_current_admin)])
+
+PROFILE_MAX_SECONDS = 60
+
+
+@router.post("/profile/sample", response_class=PlainTextResponse)
+async def profile_sample(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+):
+    """
+    Próbkuje stosy wszystkich wątków przez `seconds` i zwraca je w formacie
+    collapsed (wejście dla flamegraph.pl / speedscope).
+    """
+    if sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    try:
+        stacks = await asyncio.to_thread(sampling_profiler.sample, seconds, interval_ms / 1000)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail="Profiler already running") from exc
+    return collapsed(stacks)
+
+
+@router.post("/profile/requests")
+async def profile_requests(
+    path: str = Query(..., min_length=1, description="prefiks ścieżki, np. /rooms/"),
+    requests: int = Query(20, ge=1, le=1000),
+    seconds: float = Query(30, gt=0, le=PROFILE_MAX_SECONDS),
+    fmt: str = Query("text", alias="format", pattern="^(text|pstats)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+):
+    """
+    cProfile dla kolejnych `requests` żądań o ścieżce zaczynającej się od
+    `path` (albo do upływu `seconds`). format=pstats zwraca plik dla
+    snakeviz/flameprof.
+    """
+    try:
+        done = request_profiler.start(path, requests)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail="Capture already running") from exc
+    try:
+        await asyncio.wait_for(done.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    stats = request_profiler.stop()
+
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No matching requests")
+    if fmt == "pstats":
+        return Response(
+            stats_dump(stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="requests.prof"'},
+        )
+    return PlainTextResponse(stats_text(stats, sort, 60))
+
+
+@router.get("/jobs")
+async def jobs_metrics():
+    """Głębokość kolejki zadań w tle i liczniki workera tego procesu."""
+    return await asyncio.to_thread(job_worker.metrics)
+
+
+@router.get("/reaper")
+async def reaper_metrics():
+    """Pokoje śledzone przez reaper tego procesu i liczba zamkniętych."""
+    return room_reaper.metrics()
+
+
+@router.get("/tracing")
+async def tracing_status():
+    return tracer.metrics()
+
+
+@router.post("/tracing")
+async def tracing_configure(sample_rate: float = Query(..., ge=0, le=1)):
+    """
+    Ustawia odsetek śledzonych żądań (0 – wyłączone) w tym procesie;
+    na stałe – BINGO_TRACE_SAMPLE.
+    """
+    tracer.configure(sample_rate)
+    return tracer.metrics()
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import hash_password, verify_password, create_access_token
+from ..db import get_async_db
+from ..security import hash_password_async, verify_password_async, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -11,8 +12,10 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 @router.post(
     "/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED
 )
-def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == payload.email).first()
+async def register(payload: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(
+        select(models.User).where(models.User.email == payload.email)
+    )
     if existing:
         raise HTTPException(
             status_code=409, detail="Adres email jest przypisany do istniejącego konta"
@@ -20,19 +23,21 @@ def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
 
     user = models.User(
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password_async(payload.password),
         username=payload.username,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(
+        select(models.User).where(models.User.email == payload.email)
+    )
+    if not user or not await verify_password_async(payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Nieprawidłowy email lub hasło")
 
     token = create_access_token({"sub": str(user.id)})
@@ -1,82 +1,208 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import get_current_user
+from ..chat_cache import CachedMessage, recent_messages
+from ..db import AsyncSessionLocal, get_async_db, get_read_async_db
+from ..ratelimit import rate_limit
+from ..reaper import room_reaper
+from ..security import get_current_reader_async, get_current_user_async
+from ..serialization import format_timestamp, negotiated_response
 
 router = APIRouter(prefix="/rooms", tags=["chat"])
 
+# domyślny rozmiar strony starszych wiadomości (before_id) – tyle, ile mieści bufor
+MESSAGES_PAGE = recent_messages.room_size
+MESSAGES_PAGE_MAX = 500
+
+
+def messages_query(room_id: int):
+    # kolumny + join zamiast lazy-load m.user dla każdej wiadomości
+    return (
+        select(
+            models.Message.id,
+            models.Message.user_id,
+            models.User.username,
+            models.Message.content,
+            models.Message.created_at,
+        )
+        .join(models.User, models.User.id == models.Message.user_id)
+        .where(models.Message.room_id == room_id)
+    )
+
+
+def message_dict(msg_id, user_id, username, content, created_at) -> dict:
+    return {
+        "id": msg_id,
+        "user_id": user_id,
+        "username": username,
+        "content": content,
+        "created_at": format_timestamp(created_at),
+    }
+
+
+async def latest_messages(room: models.Room, limit: Optional[int]) -> list[dict]:
+    """
+    Ostatnie `limit` wiadomości pokoju (None – cała historia) – z bufora,
+    a gdy go nie ma albo jest nieaktualny, z bazy.
+    """
+    recent_messages.sync(room.id, room.message_count)
+    cached = recent_messages.latest(room.id, limit)
+    if cached is not None:
+        return cached
+
+    # bufor ładujemy z bazy głównej – z repliki mógłby zostać bez najnowszych;
+    # licznik przed wiadomościami, żeby bufor nie twierdził, że wie więcej
+    fetch = None if limit is None else max(recent_messages.room_size, limit)
+    async with AsyncSessionLocal() as primary:
+        count = await primary.scalar(
+            select(models.Room.message_count).where(models.Room.id == room.id)
+        )
+        rows = (
+            await primary.execute(
+                messages_query(room.id).order_by(models.Message.id.desc()).limit(fetch)
+            )
+        ).all()
+    rows.reverse()
+
+    recent_messages.preload(
+        room.id,
+        [
+            CachedMessage(msg_id, user_id, username, content, format_timestamp(created_at))
+            for msg_id, user_id, username, content, created_at in rows[-recent_messages.room_size :]
+        ],
+        complete=fetch is None or len(rows) < fetch,
+        count=count or 0,
+    )
+    return [message_dict(*m) for m in (rows if limit is None else rows[-limit:])]
+
 
-def ensure_member(db: Session, room_id: int, user_id: int):
-    member = (
-        db.query(models.RoomMember)
-        .filter(
+async def messages_after(
+    db: AsyncSession, room: models.Room, after_id: int, limit: int
+) -> list[dict]:
+    recent_messages.sync(room.id, room.message_count)
+    cached = recent_messages.after(room.id, after_id, limit)
+    if cached is not None:
+        return cached
+    rows = (
+        await db.execute(
+            messages_query(room.id)
+            .where(models.Message.id > after_id)
+            .order_by(models.Message.id.asc())
+            .limit(limit)
+        )
+    ).all()
+    return [message_dict(*m) for m in rows]
+
+
+async def messages_before(
+    db: AsyncSession, room: models.Room, before_id: int, limit: int
+) -> list[dict]:
+    recent_messages.sync(room.id, room.message_count)
+    cached = recent_messages.before(room.id, before_id, limit)
+    if cached is not None:
+        return cached
+    # starsze strony – poza buforem, prosto z bazy
+    rows = (
+        await db.execute(
+            messages_query(room.id)
+            .where(models.Message.id < before_id)
+            .order_by(models.Message.id.desc())
+            .limit(limit)
+        )
+    ).all()
+    rows.reverse()
+    return [message_dict(*m) for m in rows]
+
+
+async def ensure_member_async(db: AsyncSession, room_id: int, user_id: int):
+    member = await db.scalar(
+        select(models.RoomMember.id).where(
             models.RoomMember.room_id == room_id, models.RoomMember.user_id == user_id
         )
-        .first()
     )
     if not member:
         raise HTTPException(status_code=403, detail="Not a member of this room")
 
 
-@router.get("/{room_id}/messages", response_model=list[schemas.MessageOut])
-def get_messages(
+@router.get(
+    "/{room_id}/messages",
+    response_model=list[schemas.MessageOut],
+    dependencies=[Depends(rate_limit("get_messages", get_current_reader_async))],
+)
+async def get_messages(
     room_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    request: Request,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MESSAGES_PAGE_MAX),
+    db: AsyncSession = Depends(get_read_async_db),
+    user=Depends(get_current_reader_async),
 ):
-    room = db.get(models.Room, room_id)
+    """
+    Wiadomości rosnąco po id: bez parametrów cała historia (jak dotąd),
+    z `limit` – ostatnie `limit`; starsze strony przez before_id (id
+    najstarszej wiadomości z poprzedniej strony, domyślnie MESSAGES_PAGE).
+    """
+    room = await db.get(models.Room, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    ensure_member(db, room_id, user.id)
+    await ensure_member_async(db, room_id, user.id)
 
-    msgs = (
-        db.query(models.Message)
-        .filter(models.Message.room_id == room_id)
-        .order_by(models.Message.created_at.asc())
-        .all()
-    )
+    if before_id is None:
+        msgs = await latest_messages(room, limit)
+    else:
+        msgs = await messages_before(db, room, before_id, limit or MESSAGES_PAGE)
 
-    return [
-        schemas.MessageOut(
-            id=m.id,
-            user_id=m.user_id,
-            username=m.user.username,
-            content=m.content,
-            created_at=m.created_at,
-        )
-        for m in msgs
-    ]
+    return negotiated_response(request, msgs)
 
 
 @router.post(
     "/{room_id}/messages",
     response_model=schemas.MessageOut,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("send_message"))],
 )
-def send_message(
+async def send_message(
     room_id: int,
     payload: schemas.MessageCreate,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
 ):
-    room = db.get(models.Room, room_id)
+    room = await db.get(models.Room, room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    ensure_member(db, room_id, user.id)
+    await ensure_member_async(db, room_id, user.id)
 
     msg = models.Message(room_id=room_id, user_id=user.id, content=payload.content)
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    # w tej samej transakcji – licznik mówi buforom innych workerów, że coś doszło
+    count = await db.scalar(
+        update(models.Room)
+        .where(models.Room.id == room_id)
+        .values(message_count=models.Room.message_count + 1)
+        .returning(models.Room.message_count)
+    )
+    await db.commit()
+    await db.refresh(msg)
+    room_reaper.touch(room_id)
+
+    recent_messages.append(
+        room_id,
+        CachedMessage(
+            msg.id, user.id, user.username, msg.content, format_timestamp(msg.created_at)
+        ),
+        count,
+    )
 
     return schemas.MessageOut(
         id=msg.id,
         user_id=msg.user_id,
-        username=msg.user.username,
+        username=user.username,
         content=msg.content,
         created_at=msg.created_at,
     )
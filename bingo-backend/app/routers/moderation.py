@@ -0,0 +1,53 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from ..db import get_async_db
+from ..search import SEARCH_PAGE_SIZE, decode_cursor, encode_cursor, search_sql
+from ..security import get_current_moderator
+from ..serialization import FastJSONResponse, format_timestamp
+
+router = APIRouter(prefix="/messages", tags=["moderation"])
+
+
+@router.get("/search", response_model=schemas.MessageSearchPage)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    room_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    order: str = Query("rank", pattern="^(rank|recent)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    moderator=Depends(get_current_moderator),
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+
+    sql, params = search_sql(
+        db.bind.dialect.name, q, room_id, user_id, after, order, limit
+    )
+    rows = (await db.execute(sql, params)).all() if params["q"] else []
+
+    items = [
+        {
+            "id": msg_id,
+            "room_id": msg_room_id,
+            "user_id": msg_user_id,
+            "username": username,
+            "content": content,
+            "created_at": format_timestamp(created_at),
+            "rank": rank,
+        }
+        for msg_id, msg_room_id, msg_user_id, username, content, created_at, rank in rows
+    ]
+    next_cursor = None
+    if len(items) == limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["rank"], last["id"])
+
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
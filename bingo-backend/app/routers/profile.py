@@ -1,17 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from ..security import get_current_user
-from ..db import get_db
+from ..security import get_current_reader, get_current_user
+from ..db import get_db, get_read_db
 from .. import schemas, models
+from ..postgame import LEADERBOARD_SIZE, leaderboard
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
 
 @router.get("/me", response_model=schemas.ProfileOut)
 def get_me(
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user=Depends(get_current_reader),
+    db: Session = Depends(get_read_db)
 ):
     rooms_created = (
         db.query(models.Room)
@@ -69,3 +70,14 @@ def update_me(
         winrate=winrate,
         rooms_created=rooms_created,
     )
+
+
+@router.get("/leaderboard", response_model=list[schemas.LeaderboardEntry])
+def get_leaderboard(
+    limit: int = Query(20, ge=1, le=LEADERBOARD_SIZE),
+    user=Depends(get_current_reader),
+    db: Session = Depends(get_read_db),
+):
+    # ranking odświeżają zadania po każdej grze; tu tylko gdy jest za stary
+    leaderboard.ensure_fresh(db)
+    return leaderboard.top(limit)
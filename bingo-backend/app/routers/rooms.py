@@ -1,12 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-import random
+from sqlalchemy import exists, func, insert, literal, select, union_all, update
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import zlib
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import get_current_user, hash_password, verify_password
-from .chat import ensure_member
+from ..board import evaluate
+from ..catalog import task_catalog
+from ..db import AsyncSessionLocal, SessionLocal, get_async_db, get_db, get_read_async_db
+from ..events import (
+    EVENT_CLAIM,
+    EVENT_END,
+    EVENT_JOIN,
+    append_event,
+    event_dict,
+    events_query,
+    pack_event,
+    rebuild_board,
+)
+from ..jobs import job_worker
+from ..lobby import lobby
+from ..postgame import game_finished_jobs
+from ..ratelimit import rate_limit
+from ..reaper import room_reaper
+from ..serialization import dumps, negotiated_response
+from ..shm_board import board_store
+from ..security import (
+    get_current_reader_async,
+    get_current_user,
+    get_current_user_async,
+    get_current_user_id,
+    hash_password,
+    oauth2_scheme,
+    user_from_token,
+    verify_password,
+)
+from .chat import ensure_member_async, latest_messages, messages_after
 from pydantic import BaseModel
 
 
@@ -25,86 +59,251 @@ PLAYER_COLORS = [
     "#f97316",  # pomarańcz
 ]
 
+# ile wiadomości zwraca /state przy pierwszym wejściu (bez kursora)
+STATE_MESSAGES_LIMIT = 50
+STATE_MESSAGES_MAX = 200
 
-def assign_color(room: models.Room) -> str:
-    """Zwraca wolny kolor w pokoju; jeśli wszystkie zajęte – losuje z istniejących."""
-    used_colors = {m.color for m in room.members if m.color}
-    for c in PLAYER_COLORS:
-        if c not in used_colors:
-            return c
-    return random.choice(PLAYER_COLORS)
-
-
-@router.get("", response_model=list[schemas.RoomOut])
-def list_rooms(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    rooms = db.query(models.Room).all()
-
-    result: list[schemas.RoomOut] = []
-    for r in rooms:
-        players_count = len(r.members)
-        result.append(
-            schemas.RoomOut(
-                id=r.id,
-                name=r.name,
-                category=r.category,
-                has_password=bool(r.password_hash),
-                max_players=r.max_players,
-                players_count=players_count,
+
+# ile razy ponawiamy przydział miejsca po konflikcie unikalności (tylko Postgres)
+SEAT_RETRIES = 3
+# ile pokoi z indeksu próbuje quick-join, zanim założy nowy
+QUICK_JOIN_ATTEMPTS = 3
+
+
+class SeatUnavailable(Exception):
+    pass
+
+
+def allocate_seat(db: Session, room_id: int, user_id: int) -> str:
+    """
+    Atomowo dodaje gracza do pokoju i zwraca przydzielony kolor.
+
+    Wszystko dzieje się w jednym INSERT ... SELECT: miejsce jest wolne tylko
+    gdy liczba członków < max_players, kolor to pierwszy z PLAYER_COLORS,
+    którego nikt w pokoju nie ma. Równoległe wejścia nie przepełnią pokoju
+    i nie dostaną tego samego koloru. Rzuca SeatUnavailable, gdy nie ma miejsca.
+    """
+    palette = union_all(
+        *(
+            select(literal(i).label("ord"), literal(c).label("color"))
+            for i, c in enumerate(PLAYER_COLORS)
+        )
+    ).subquery()
+
+    used_colors = select(models.RoomMember.color).where(
+        models.RoomMember.room_id == room_id, models.RoomMember.color.is_not(None)
+    )
+    members_count = (
+        select(func.count(models.RoomMember.id))
+        .where(models.RoomMember.room_id == room_id)
+        .scalar_subquery()
+    )
+    max_players = (
+        select(models.Room.max_players).where(models.Room.id == room_id).scalar_subquery()
+    )
+    already_member = exists().where(
+        models.RoomMember.room_id == room_id, models.RoomMember.user_id == user_id
+    )
+
+    seat = (
+        select(
+            literal(room_id),
+            literal(user_id),
+            literal(datetime.utcnow()),
+            palette.c.color,
+        )
+        .where(
+            palette.c.color.not_in(used_colors),
+            members_count < max_players,
+            ~already_member,
+        )
+        .order_by(palette.c.ord)
+        .limit(1)
+    )
+
+    for _ in range(SEAT_RETRIES):
+        # na Postgresie blokujemy wiersz pokoju; SQLite i tak ma jednego pisarza
+        db.execute(
+            select(models.Room.id).where(models.Room.id == room_id).with_for_update()
+        )
+        try:
+            result = db.execute(
+                insert(models.RoomMember).from_select(
+                    ["room_id", "user_id", "joined_at", "color"], seat
+                )
+            )
+        except IntegrityError:
+            db.rollback()
+            continue
+        if result.rowcount != 1:
+            db.rollback()
+            raise SeatUnavailable()
+        db.execute(append_event(room_id, EVENT_JOIN, user_id))
+        color = db.scalar(
+            select(models.RoomMember.color).where(
+                models.RoomMember.room_id == room_id,
+                models.RoomMember.user_id == user_id,
             )
         )
-    return result
+        db.commit()
+        room_reaper.touch(room_id)
+        if board_store is not None:
+            board_store.add_player(room_id, user_id, _color_index(color))
+        return color
+
+    raise SeatUnavailable()
+
+
+def is_member(db: Session, room_id: int, user_id: int) -> bool:
+    return (
+        db.scalar(
+            select(models.RoomMember.id).where(
+                models.RoomMember.room_id == room_id,
+                models.RoomMember.user_id == user_id,
+            )
+        )
+        is not None
+    )
+
+
+def players_count(db: Session, room_id: int) -> int:
+    return db.scalar(
+        select(func.count(models.RoomMember.id)).where(
+            models.RoomMember.room_id == room_id
+        )
+    )
+
+
+@router.get(
+    "",
+    response_model=list[schemas.RoomOut],
+    dependencies=[Depends(rate_limit("list_rooms", get_current_reader_async))],
+)
+async def list_rooms(
+    request: Request,
+    db: AsyncSession = Depends(get_read_async_db),
+    user=Depends(get_current_reader_async),
+):
+    # liczba graczy jednym zapytaniem zamiast lazy-load room.members per pokój
+    counts = (
+        select(models.RoomMember.room_id, func.count(models.RoomMember.id).label("n"))
+        .group_by(models.RoomMember.room_id)
+        .subquery()
+    )
+    rows = (
+        await db.execute(
+            select(
+                models.Room.id,
+                models.Room.name,
+                models.Room.category,
+                models.Room.password_hash,
+                models.Room.max_players,
+                counts.c.n,
+            )
+            .outerjoin(counts, counts.c.room_id == models.Room.id)
+            .order_by(models.Room.id)
+        )
+    ).all()
+
+    return negotiated_response(
+        request,
+        [
+            {
+                "id": room_id,
+                "name": name,
+                "category": category,
+                "has_password": bool(password_hash),
+                "max_players": max_players,
+                "players_count": n or 0,
+            }
+            for room_id, name, category, password_hash, max_players, n in rows
+        ]
+    )
 
 
-@router.post("", response_model=schemas.RoomOut, status_code=status.HTTP_201_CREATED)
+@router.get("/stream")
+def lobby_stream(token: str = Depends(oauth2_scheme)):
+    """
+    Server-Sent Events: najpierw snapshot otwartych pokoi, potem zdarzenia
+    room-created / player-count-changed / room-finished.
+    """
+    # sesja tylko na czas autoryzacji – strumień nie trzyma połączenia z bazą
+    with SessionLocal() as db:
+        user_from_token(db, token)
+        lobby.ensure_loaded(db)
+
+    return StreamingResponse(
+        lobby.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "",
+    response_model=schemas.RoomOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("create_room", get_current_user))],
+)
 def create_room(
     payload: schemas.RoomCreate,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    room = models.Room(
+    room, count = _create_room(
+        db,
+        owner_id=user.id,
         name=payload.name,
         category=payload.category,
-        max_players=min(payload.max_players, 5),
-        owner_id=user.id,
-        password_hash=hash_password(payload.password) if payload.password else None,
+        max_players=payload.max_players,
+        password=payload.password,
+    )
+    return _room_out(room, count)
+
+
+def _create_room(
+    db: Session,
+    owner_id: int,
+    name: str,
+    category: str,
+    max_players: int,
+    password: Optional[str],
+) -> tuple[models.Room, int]:
+    room = models.Room(
+        name=name,
+        category=category,
+        # co najmniej twórca pokoju, najwyżej tylu graczy, ile jest kolorów
+        max_players=max(1, min(max_players, len(PLAYER_COLORS))),
+        owner_id=owner_id,
+        password_hash=hash_password(password) if password else None,
     )
     db.add(room)
     db.commit()
     db.refresh(room)
 
-    random_tasks = (
-        db.query(models.Task)
-        .filter(models.Task.category == payload.category)
-        .order_by(func.random())
-        .limit(25)
-        .all()
-    )
-
-    for task in random_tasks:
+    task_catalog.ensure_loaded(db)
+    for task_id in task_catalog.sample(category, 25):
         member = models.TaskAssignment(
-            finishing_uid=None, room_id=room.id, task_id=task.id
+            finishing_uid=None, room_id=room.id, task_id=task_id
         )
         db.add(member)
     db.commit()
+    room_reaper.track(room.id, room.created_at)
 
     # twórca pokoju od razu dołącza z kolorem
-    color = assign_color(room)
-    member = models.RoomMember(room_id=room.id, user_id=user.id, color=color)
-    db.add(member)
-    db.commit()
-    db.refresh(room)
+    allocate_seat(db, room.id, owner_id)
+    count = players_count(db, room.id)
 
-    return schemas.RoomOut(
-        id=room.id,
-        name=room.name,
-        category=room.category,
-        has_password=bool(room.password_hash),
-        max_players=room.max_players,
-        players_count=len(room.members),
-    )
+    lobby.room_created(room, count)
+
+    return room, count
 
 
-@router.post("/{room_id}/join", response_model=schemas.RoomOut)
+@router.post(
+    "/{room_id}/join",
+    response_model=schemas.RoomOut,
+    dependencies=[Depends(rate_limit("join", get_current_user))],
+)
 def join_room(
     room_id: int,
     payload: JoinRoomPayload,
@@ -115,7 +314,12 @@ def join_room(
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    if len(room.members) >= room.max_players:
+    # gracz już w pokoju – bez sprawdzania miejsc i bez PBKDF2
+    if is_member(db, room.id, user.id):
+        return _room_out(room, players_count(db, room.id))
+
+    # szybka odmowa przed kosztownym hashowaniem; ostateczna decyzja w allocate_seat
+    if players_count(db, room.id) >= room.max_players:
         raise HTTPException(status_code=403, detail="Room is full")
 
     password = payload.password
@@ -124,249 +328,554 @@ def join_room(
         if not password or not verify_password(password, room.password_hash):
             raise HTTPException(status_code=401, detail="Invalid room password")
 
-    existing = (
-        db.query(models.RoomMember)
-        .filter(
-            models.RoomMember.room_id == room.id,
-            models.RoomMember.user_id == user.id,
-        )
-        .first()
+    try:
+        allocate_seat(db, room.id, user.id)
+    except SeatUnavailable as exc:
+        # równoległe wejście tego samego gracza zajęło już jego miejsce
+        if is_member(db, room.id, user.id):
+            return _room_out(room, players_count(db, room.id))
+        raise HTTPException(status_code=403, detail="Room is full") from exc
+
+    count = players_count(db, room.id)
+    lobby.players_changed(room.id, count)
+
+    return _room_out(room, count)
+
+
+@router.post(
+    "/quick-join",
+    response_model=schemas.RoomOut,
+    dependencies=[Depends(rate_limit("join", get_current_user))],
+)
+def quick_join(
+    category: str = Query(..., pattern="^(Nauka|Sport)$"),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Dołącza do otwartego pokoju bez hasła z wolnym miejscem w danej kategorii
+    (wybór z indeksu lobby w pamięci); gdy takiego nie ma – zakłada nowy.
+    """
+    lobby.ensure_loaded(db)
+
+    tried: set[int] = set()
+    for _ in range(QUICK_JOIN_ATTEMPTS):
+        room_id = lobby.pick_open_room(category, exclude=tried)
+        if room_id is None:
+            break
+        tried.add(room_id)
+
+        room = db.get(models.Room, room_id)
+        if room is None or room.done:
+            continue
+        try:
+            allocate_seat(db, room.id, user.id)
+        except SeatUnavailable:
+            # już jesteśmy w tym pokoju – po prostu do niego wracamy
+            count = players_count(db, room.id)
+            if is_member(db, room.id, user.id):
+                return _room_out(room, count)
+            # indeks był nieaktualny (pokój pełny) – poprawiamy i szukamy dalej
+            lobby.players_changed(room.id, count)
+            continue
+
+        count = players_count(db, room.id)
+        lobby.players_changed(room.id, count)
+        return _room_out(room, count)
+
+    room, count = _create_room(
+        db,
+        owner_id=user.id,
+        name=f"Szybka gra – {category}",
+        category=category,
+        max_players=5,
+        password=None,
     )
-    if not existing:
-        color = assign_color(room)
-        db.add(models.RoomMember(room_id=room.id, user_id=user.id, color=color))
-        db.commit()
-        db.refresh(room)
+    return _room_out(room, count)
+
 
+def _room_out(room: models.Room, count: int) -> schemas.RoomOut:
     return schemas.RoomOut(
         id=room.id,
         name=room.name,
         category=room.category,
         has_password=bool(room.password_hash),
         max_players=room.max_players,
-        players_count=len(room.members),
+        players_count=count,
     )
 
 
-@router.get("/{room_id}/tasks", response_model=list[schemas.TaskOut])
-def room_tasks(
+@router.get(
+    "/{room_id}/tasks",
+    response_model=list[schemas.TaskOut],
+    dependencies=[Depends(rate_limit("room_tasks", get_current_user_id))],
+)
+async def room_tasks(
     room_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_read_async_db),
+    user_id: int = Depends(get_current_user_id),
 ):
-    room = db.get(models.Room, room_id)
-    ensure_member(db, room.id, user.id)
-
-    members_colors = {m.user_id: m.color for m in room.members}
+    """
+    Plansza pokoju. Z BINGO_SHM_BOARDS aktywne pokoje idą ze współdzielonej
+    pamięci bez zapytań do bazy. ETag + If-None-Match -> 304.
+    """
+    if board_store is None:
+        return await _tasks_from_db(request, db, room_id, user_id)
+
+    if task_catalog.loaded:
+        snapshot = board_store.get(room_id)
+        if snapshot is not None and user_id in snapshot.players:
+            return _tasks_response(request, room_id, snapshot.version,
+                                   lambda: shm_board_tiles(snapshot))
+
+    # planszy nie ma w pamięci – wypełniamy ją z bazy głównej, bo opóźniona
+    # replika zapisałaby stary stan aż do następnego przejęcia
+    async with AsyncSessionLocal() as primary:
+        return await _tasks_from_db(request, primary, room_id, user_id, fill=True)
+
+
+async def _tasks_from_db(
+    request: Request, db: AsyncSession, room_id: int, user_id: int, fill: bool = False
+):
+    room = await db.get(models.Room, room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    await ensure_member_async(db, room.id, user_id)
+
+    members_colors = dict(
+        (
+            await db.execute(
+                select(models.RoomMember.user_id, models.RoomMember.color).where(
+                    models.RoomMember.room_id == room.id
+                )
+            )
+        ).all()
+    )
 
-    tasks = (
-        db.query(models.TaskAssignment, models.Task)
-        .join(models.Task)
-        .filter(models.TaskAssignment.room_id == room.id)
-        .order_by(models.TaskAssignment.id)
-        .all()
+    await task_catalog.ensure_loaded_async(db)
+    board = await rebuild_board(db, room.id) if fill and not room.done else None
+    # pokoje sprzed dziennika (board None) i odczyty bez wypełniania – z task_assignments
+    rows = board.rows() if board is not None else await board_rows(db, room.id)
+    if fill and not room.done:
+        # put scala pola, więc odczyt sprzed równoległego przejęcia niczego nie cofnie
+        stored = await store_board(
+            room.id, rows, {uid: _color_index(color) for uid, color in members_colors.items()}
+        )
+        # gra skończyła się w trakcie wypełniania – app.postgame mógł już usunąć planszę
+        if stored and await db.scalar(select(models.Room.done).where(models.Room.id == room.id)):
+            await asyncio.to_thread(board_store.remove, room.id)
+
+    version = sum(1 for _, _, uid in rows if uid is not None)
+    return _tasks_response(request, room.id, version, lambda: board_tiles(rows, members_colors))
+
+
+def _tasks_response(request: Request, room_id: int, version: int, build_board):
+    # pola nigdy nie wracają do wolnych, więc liczba zajętych wyznacza stan
+    # planszy – ten sam ETag z pamięci współdzielonej i z bazy
+    etag = f'W/"{room_id}.{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    response = negotiated_response(request, build_board())
+    response.headers["ETag"] = etag
+    return response
+
+
+async def board_rows(db: AsyncSession, room_id: int) -> list:
+    """(assignment_id, task_id, finishing_uid) pól planszy w kolejności."""
+    return (
+        await db.execute(
+            select(
+                models.TaskAssignment.id,
+                models.TaskAssignment.task_id,
+                models.TaskAssignment.finishing_uid,
+            )
+            .where(models.TaskAssignment.room_id == room_id)
+            .order_by(models.TaskAssignment.id)
+        )
+    ).all()
+
+
+async def store_board(room_id: int, rows, players: dict, done: bool = False) -> bool:
+    """
+    Zapis planszy (wiersze z board_rows) do pamięci współdzielonej. flock może
+    czekać na inny proces, więc poza pętlą zdarzeń. Koniec gry tylko
+    aktualizuje istniejącą planszę – nie odtwarzamy tej, którą usunął app.postgame.
+    """
+    if board_store is None:
+        return False
+    return await asyncio.to_thread(
+        board_store.put,
+        room_id,
+        [asg_id for asg_id, _, _ in rows],
+        [task_id for _, task_id, _ in rows],
+        [uid for _, _, uid in rows],
+        players,
+        done=done,
+        create=not done,
     )
 
+
+def board_tiles(rows, members_colors: dict[int, str]) -> list[dict]:
     return [
-        schemas.TaskOut(
-            assignment_id=assignment.id,
-            description=task.description,
-            finished_by=assignment.finishing_uid,
-            color=members_colors.get(assignment.finishing_uid),
-        )
-        for assignment, task in tasks
+        {
+            "assignment_id": asg_id,
+            "description": task_catalog.description(task_id),
+            "finished_by": finishing_uid,
+            "color": members_colors.get(finishing_uid),
+        }
+        for asg_id, task_id, finishing_uid in rows
     ]
 
 
-@router.get("/{room_id}/tasks/{asg_id}/finished", response_model=schemas.TaskFinished)
-def room_finish_task(
+def shm_board_tiles(snapshot) -> list[dict]:
+    colors = {
+        uid: PLAYER_COLORS[i] if 0 <= i < len(PLAYER_COLORS) else None
+        for uid, i in snapshot.players.items()
+    }
+    return board_tiles(zip(snapshot.asg_ids, snapshot.task_ids, snapshot.uids), colors)
+
+
+def _color_index(color: Optional[str]) -> int:
+    return PLAYER_COLORS.index(color) if color in PLAYER_COLORS else -1
+
+
+async def load_board(
+    db: AsyncSession, room_id: int, members_colors: dict[int, str]
+) -> list[dict]:
+    await task_catalog.ensure_loaded_async(db)
+    return board_tiles(await board_rows(db, room_id), members_colors)
+
+
+def section_etag(data) -> str:
+    # stabilny między workerami (w przeciwieństwie do hash()) i tani
+    return format(zlib.crc32(dumps(data)), "08x")
+
+
+@router.get(
+    "/{room_id}/state",
+    response_model=schemas.RoomStateOut,
+    dependencies=[Depends(rate_limit("room_state", get_current_reader_async))],
+)
+async def room_state(
+    room_id: int,
+    request: Request,
+    after_id: Optional[int] = None,
+    board_etag: Optional[str] = None,
+    players_etag: Optional[str] = None,
+    limit: int = Query(STATE_MESSAGES_LIMIT, ge=1, le=STATE_MESSAGES_MAX),
+    db: AsyncSession = Depends(get_read_async_db),
+    user=Depends(get_current_reader_async),
+):
+    """
+    Cały stan pokoju jednym zapytaniem HTTP: plansza, gracze, nowe wiadomości
+    i status gry. Sekcje board/players mają własne etagi – jeśli klient poda
+    aktualny etag, sekcja wraca bez danych. Wiadomości idą od kursora after_id.
+    """
+    room = await db.get(models.Room, room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    # lista graczy od razu służy jako sprawdzenie członkostwa
+    players = [
+        {"user_id": uid, "username": username or email, "color": color}
+        for uid, username, email, color in (
+            await db.execute(
+                select(
+                    models.RoomMember.user_id,
+                    models.User.username,
+                    models.User.email,
+                    models.RoomMember.color,
+                )
+                .join(models.User, models.User.id == models.RoomMember.user_id)
+                .where(models.RoomMember.room_id == room_id)
+                .order_by(models.RoomMember.id)
+            )
+        ).all()
+    ]
+    if not any(p["user_id"] == user.id for p in players):
+        raise HTTPException(status_code=403, detail="Not a member of this room")
+
+    members_colors = {p["user_id"]: p["color"] for p in players}
+    board = await load_board(db, room_id, members_colors)
+
+    if after_id is None:
+        # pierwsze wejście – ostatnie `limit` wiadomości
+        messages = await latest_messages(room, limit)
+    else:
+        messages = await messages_after(db, room, after_id, limit)
+
+    board_tag = section_etag(board)
+    players_tag = section_etag(players)
+
+    return negotiated_response(
+        request,
+        {
+            "room_id": room.id,
+            "done": room.done,
+            "winner_uid": room.winner_uid,
+            "board": {
+                "etag": board_tag,
+                "tiles": None if board_etag == board_tag else board,
+            },
+            "players": {
+                "etag": players_tag,
+                "items": None if players_etag == players_tag else players,
+            },
+            "messages": {
+                "cursor": messages[-1]["id"] if messages else after_id,
+                "items": messages,
+            },
+        }
+    )
+
+
+@router.get(
+    "/{room_id}/tasks/{asg_id}/finished",
+    response_model=schemas.TaskFinished,
+    dependencies=[Depends(rate_limit("finish_task"))],
+)
+async def room_finish_task(
     room_id: int,
     asg_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
 ):
-    room = db.get(models.Room, room_id)
-    ensure_member(db, room.id, user.id)
+    # na Postgresie blokujemy wiersz pokoju do końca transakcji: numery seq
+    # w dzienniku i rozstrzygnięcie gry idą po kolei (SQLite ma jednego pisarza)
+    room = await db.get(models.Room, room_id, with_for_update=True)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    await ensure_member_async(db, room.id, user.id)
 
     if room.done:
         raise HTTPException(status_code=418, detail="The game is finished")
 
-    assignment, task = (
-        db.query(models.TaskAssignment, models.Task)
-        .join(models.Task)
-        .filter(models.TaskAssignment.id == asg_id)
-        .order_by(models.TaskAssignment.id)
-    ).first()
-
-    if assignment.finishing_uid is not None:
+    # warunkowy UPDATE – dwa równoczesne kliknięcia nie przejmą tego samego pola
+    claimed = await db.execute(
+        update(models.TaskAssignment)
+        .where(
+            models.TaskAssignment.id == asg_id,
+            models.TaskAssignment.room_id == room_id,
+            models.TaskAssignment.finishing_uid.is_(None),
+        )
+        .values(finishing_uid=user.id)
+    )
+    if claimed.rowcount == 0:
+        assignment = await db.get(models.TaskAssignment, asg_id)
+        if assignment is None or assignment.room_id != room_id:
+            raise HTTPException(status_code=404, detail="Task not found")
         raise HTTPException(status_code=403, detail="Task already finished")
-
-    assignment.finishing_uid = user.id
+    await db.execute(append_event(room_id, EVENT_CLAIM, user.id, asg_id))
 
     # aktualny stan planszy
-    results = (
-        db.query(models.TaskAssignment, models.Task)
-        .join(models.Task)
-        .filter(models.TaskAssignment.room_id == room_id)
-        .order_by(models.TaskAssignment.id)
-        .all()
-    )
+    rows = await board_rows(db, room_id)
+    return await commit_claims(db, room, rows, evaluate([uid for _, _, uid in rows]))
 
-    uids_flat = [row[0].finishing_uid for row in results]
-
-    size = 5
-    map_2d: list[list[int | None]] = []
-    for i in range(0, len(uids_flat), size):
-        map_2d.append(uids_flat[i : i + size])
-
-    # wszyscy użytkownicy w pokoju (do statystyk + nicków)
-    room_users = (
-        db.query(models.Room, models.RoomMember, models.User)
-        .select_from(models.Room)
-        .join(models.RoomMember)
-        .join(models.User)
-        .filter(models.Room.id == room_id)
-        .all()
-    )
-    users_by_id = {u.id: u for _room, _member, u in room_users}
-
-    winner_id: int | None = None
-    win_type: str | None = None
-    winner_tiles: int | None = None
-    draw_usernames: list[str] | None = None
-    draw_tiles: int | None = None
-
-    # ===== 1. klasyczne bingo =====
-
-    # wiersze
-    for row_vals in map_2d:
-        s = set(row_vals)
-        if len(s) == 1 and None not in s:
-            winner_id = next(iter(s))
-            win_type = "bingo"
-            break
 
-    # kolumny
-    if winner_id is None:
-        for i in range(size):
-            col = [row_vals[i] for row_vals in map_2d]
-            s = set(col)
-            if len(s) == 1 and None not in s:
-                winner_id = next(iter(s))
-                win_type = "bingo"
-                break
-
-    # przekątne
-    if winner_id is None:
-        diag1 = [row_vals[i] for i, row_vals in enumerate(map_2d)]
-        s = set(diag1)
-        if len(s) == 1 and None not in s:
-            winner_id = next(iter(s))
-            win_type = "bingo"
-        else:
-            diag2 = [row_vals[-i - 1] for i, row_vals in enumerate(map_2d)]
-            s = set(diag2)
-            if len(s) == 1 and None not in s:
-                winner_id = next(iter(s))
-                win_type = "bingo"
-
-    # jeśli bingo
-    if winner_id is not None and win_type == "bingo":
-        # zliczamy ile pól ma zwycięzca (informacyjnie)
-        winner_tiles = uids_flat.count(winner_id)
-        winner_username = None
-        if winner_id in users_by_id:
-            winner_username = users_by_id[winner_id].username or users_by_id[
-                winner_id
-            ].email
-
-        # statystyki
-        for _room, _member, u in room_users:
-            u.games_played += 1
-            if u.id == winner_id:
-                u.games_won += 1
-
-        room.done = True
-        room.winner_uid = winner_id
-        db.commit()
+@router.post(
+    "/{room_id}/claims",
+    response_model=schemas.ClaimBatchOut,
+    dependencies=[Depends(rate_limit("claims"))],
+)
+async def room_claims(
+    room_id: int,
+    payload: schemas.ClaimBatch,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    """
+    Kilka przejęć jednym żądaniem i w jednej transakcji (gra offline).
+
+    Przejęcia idą w kolejności claimed_at; zgłoszenie bez znacznika idzie
+    zaraz po poprzednim z listy. Pole zajęte już przez kogoś innego zostaje
+    jego ("taken") – liczy się kolejność na serwerze, nie czas z telefonu.
+    Gra rozstrzyga się w tej kolejności: przejęcia po tym, które ją kończy,
+    dostają "game_over" i nie są zapisywane.
+    """
+    # blokada pokoju jak w room_finish_task
+    room = await db.get(models.Room, room_id, with_for_update=True)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    await ensure_member_async(db, room.id, user.id)
 
-        return schemas.TaskFinished(
-            game_finished=True,
-            winner_id=winner_id,
-            winner_username=winner_username,
-            win_type="bingo",
-            winner_tiles=winner_tiles,
-        )
+    if room.done:
+        raise HTTPException(status_code=418, detail="The game is finished")
 
-    # ===== 2. brak bingo – sprawdzamy czy plansza pełna =====
-
-    if None not in uids_flat:
-        # policz ile pól ma każdy gracz
-        counts: dict[int, int] = {}
-        for uid_val in uids_flat:
-            counts[uid_val] = counts.get(uid_val, 0) + 1
-
-        max_count = max(counts.values())
-        leaders = [uid_val for uid_val, c in counts.items() if c == max_count]
-
-        # każdy rozegrał grę
-        for _room, _member, u in room_users:
-            u.games_played += 1
-
-        if len(leaders) == 1:
-            # zwycięzca z największą liczbą pól
-            winner_id = leaders[0]
-            winner_tiles = max_count
-            winner_username = None
-            if winner_id in users_by_id:
-                winner_username = users_by_id[winner_id].username or users_by_id[
-                    winner_id
-                ].email
-
-            for _room, _member, u in room_users:
-                if u.id == winner_id:
-                    u.games_won += 1
-
-            room.done = True
-            room.winner_uid = winner_id
-            db.commit()
-
-            return schemas.TaskFinished(
-                game_finished=True,
-                winner_id=winner_id,
-                winner_username=winner_username,
-                win_type="most_tiles",
-                winner_tiles=winner_tiles,
-            )
+    rows = await board_rows(db, room_id)
+    position = {asg_id: i for i, (asg_id, _, _) in enumerate(rows)}
+    uids = [uid for _, _, uid in rows]
+
+    outcomes = []
+    claimed = 0
+    result = None
+    for claim in _claim_order(payload.claims):
+        asg_id = claim.assignment_id
+        i = position.get(asg_id)
+        if i is None:
+            outcomes.append(schemas.ClaimOutcome(assignment_id=asg_id, status="not_found"))
+            continue
+
+        if result is not None:
+            outcome = "game_over"
+        elif uids[i] == user.id:
+            outcome = "already_yours"
+        elif uids[i] is not None:
+            outcome = "taken"
         else:
-            # remis – kilku graczy ma tyle samo pól
-            draw_usernames = []
-            for uid_val in leaders:
-                user_obj = users_by_id.get(uid_val)
-                if user_obj:
-                    draw_usernames.append(
-                        user_obj.username or user_obj.email
+            # warunkowy UPDATE jak w room_finish_task
+            updated = await db.execute(
+                update(models.TaskAssignment)
+                .where(
+                    models.TaskAssignment.id == asg_id,
+                    models.TaskAssignment.finishing_uid.is_(None),
+                )
+                .values(finishing_uid=user.id)
+            )
+            if updated.rowcount == 0:
+                # ktoś zajął pole między odczytem planszy a UPDATE
+                uids[i] = await db.scalar(
+                    select(models.TaskAssignment.finishing_uid).where(
+                        models.TaskAssignment.id == asg_id
                     )
+                )
+                outcome = "taken"
+            else:
+                uids[i] = user.id
+                await db.execute(append_event(room_id, EVENT_CLAIM, user.id, asg_id))
+                claimed += 1
+                outcome = "claimed"
+                result = evaluate(uids)
+        outcomes.append(
+            schemas.ClaimOutcome(assignment_id=asg_id, status=outcome, finished_by=uids[i])
+        )
 
-            room.done = True
-            room.winner_uid = None
-            db.commit()
-
-            return schemas.TaskFinished(
-                game_finished=True,
-                winner_id=None,
-                winner_username=None,
-                win_type="draw",
-                draw_usernames=draw_usernames,
-                draw_tiles=max_count,
+    if claimed:
+        # inni gracze mogli w tym czasie zająć pozostałe pola – rozstrzyga stan z bazy
+        rows = await board_rows(db, room_id)
+        result = evaluate([uid for _, _, uid in rows])
+
+    game = await commit_claims(db, room, rows, result)
+    return schemas.ClaimBatchOut(results=outcomes, game=game)
+
+
+def _claim_order(claims: list[schemas.ClaimIn]) -> list[schemas.ClaimIn]:
+    keyed = []
+    at = float("-inf")
+    for claim in claims:
+        if claim.claimed_at is not None:
+            claimed_at = claim.claimed_at
+            if claimed_at.tzinfo is None:
+                claimed_at = claimed_at.replace(tzinfo=timezone.utc)
+            at = claimed_at.timestamp()
+        keyed.append((at, claim))
+    # sort stabilny – równe znaczniki zostają w kolejności z listy
+    return [claim for _, claim in sorted(keyed, key=lambda item: item[0])]
+
+
+async def commit_claims(
+    db: AsyncSession, room: models.Room, rows: list, result
+) -> schemas.TaskFinished:
+    """
+    Zatwierdza przejęcia pól (i koniec gry, jeśli result) i aktualizuje stan
+    w pamięci. Wywołujący wykonał już UPDATE-y i zdarzenia EVENT_CLAIM,
+    rows to plansza z board_rows po przejęciach.
+    """
+    room_id = room.id
+
+    # ===== gra dalej trwa =====
+    if result is None:
+        await db.commit()
+        room_reaper.touch(room_id)
+        # także gdy planszy jeszcze nie ma – inaczej spóźnione wypełnienie
+        # zostawiłoby stan sprzed przejęcia; graczy dopisze pierwszy room_tasks
+        await store_board(room_id, rows, {})
+        return schemas.TaskFinished(
+            game_finished=False,
+            winner_id=None,
+            winner_username=None,
+            win_type=None,
+        )
+
+    # statystyki, ranking i archiwum liczą się w tle (app.postgame)
+    room.done = True
+    room.winner_uid = result.winner_id
+    await db.execute(append_event(room_id, EVENT_END, result.winner_id))
+    for job in game_finished_jobs(room_id, result.winner_id):
+        await db.execute(job)
+    await db.commit()
+    await store_board(room_id, rows, {}, done=True)
+    job_worker.notify()
+    lobby.room_finished(room.id, result.winner_id)
+    room_reaper.forget(room.id)
+
+    # nicki tylko liderów, nie wszystkich graczy
+    names = {
+        uid: username or email
+        for uid, username, email in (
+            await db.execute(
+                select(models.User.id, models.User.username, models.User.email).where(
+                    models.User.id.in_(result.leaders)
+                )
             )
+        ).all()
+    }
 
-    # ===== 3. gra dalej trwa =====
+    if result.win_type == "draw":
+        # remis – kilku graczy ma tyle samo pól
+        return schemas.TaskFinished(
+            game_finished=True,
+            winner_id=None,
+            winner_username=None,
+            win_type="draw",
+            draw_usernames=[names[uid] for uid in result.leaders if uid in names],
+            draw_tiles=result.tiles,
+        )
 
-    db.commit()
     return schemas.TaskFinished(
-        game_finished=False,
-        winner_id=None,
-        winner_username=None,
-        win_type=None,
+        game_finished=True,
+        winner_id=result.winner_id,
+        winner_username=names.get(result.winner_id),
+        win_type=result.win_type,
+        winner_tiles=result.tiles,
     )
+
+
+@router.get("/{room_id}/replay")
+async def room_replay(
+    room_id: int,
+    after_seq: int = 0,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|binary)$"),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    """
+    Strumień zdarzeń gry od after_seq: NDJSON (jedno zdarzenie na linię) albo
+    format=binary – rekordy app.events.EVENT_RECORD (21 bajtów, little-endian).
+    """
+    room = await db.get(models.Room, room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    await ensure_member_async(db, room.id, user.id)
+
+    if fmt == "binary":
+        encode, media_type = pack_event, "application/octet-stream"
+    else:
+        encode, media_type = _ndjson_event, "application/x-ndjson"
+
+    async def stream():
+        # własna sesja – strumień może trwać dłużej niż zależności requestu
+        cursor = after_seq
+        async with AsyncSessionLocal() as replay_db:
+            while True:
+                rows = (await replay_db.execute(events_query(room_id, cursor))).all()
+                if not rows:
+                    break
+                yield b"".join(encode(*row) for row in rows)
+                cursor = rows[-1][0]
+
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+def _ndjson_event(*event) -> bytes:
+    return dumps(event_dict(*event)) + b"\n"
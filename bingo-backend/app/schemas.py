@@ -2,6 +2,8 @@ from datetime import datetime
 from pydantic import BaseModel, EmailStr, field_validator, field_serializer
 from typing import Optional, List
 
+from .serialization import format_timestamp
+
 # ===== Auth =====
 
 
@@ -77,7 +79,7 @@ class MessageOut(BaseModel):
 
     @field_serializer("created_at")
     def parse_date(self, dt: datetime, _):
-        return dt.strftime("%H:%M %d-%m-%Y")
+        return format_timestamp(dt)
 
     class Config:
         from_attributes = True
@@ -99,6 +101,13 @@ class ProfileOut(BaseModel):
         from_attributes = True
 
 
+class LeaderboardEntry(BaseModel):
+    user_id: int
+    username: str
+    games_won: int
+    games_played: int
+
+
 class ProfileUpdate(BaseModel):
     username: Optional[str] = None
 
@@ -126,3 +135,91 @@ class TaskFinished(BaseModel):
     # przy remisie: lista nicków oraz liczba pól
     draw_usernames: Optional[List[str]] = None
     draw_tiles: Optional[int] = None
+
+
+# ===== Claims (kilka pól jednym żądaniem, np. po powrocie do sieci) =====
+
+# więcej pól niż na planszy nie ma sensu
+MAX_BATCH_CLAIMS = 25
+
+
+class ClaimIn(BaseModel):
+    assignment_id: int
+    # kiedy gracz zaznaczył pole offline; tylko do ustalenia kolejności
+    claimed_at: Optional[datetime] = None
+
+
+class ClaimBatch(BaseModel):
+    claims: List[ClaimIn]
+
+    @field_validator("claims")
+    @classmethod
+    def claims_count(cls, v: List[ClaimIn]) -> List[ClaimIn]:
+        if not 1 <= len(v) <= MAX_BATCH_CLAIMS:
+            raise ValueError(f"claims must contain 1-{MAX_BATCH_CLAIMS} items")
+        return v
+
+
+class ClaimOutcome(BaseModel):
+    assignment_id: int
+    # "claimed", "already_yours", "taken", "not_found", "game_over"
+    status: str
+    # kto ma pole po przetworzeniu paczki
+    finished_by: Optional[int] = None
+
+
+class ClaimBatchOut(BaseModel):
+    # w kolejności przetwarzania (wg claimed_at)
+    results: List[ClaimOutcome]
+    game: TaskFinished
+
+
+# ===== Room state (plansza + gracze + chat jednym zapytaniem) =====
+
+
+class PlayerOut(BaseModel):
+    user_id: int
+    username: Optional[str]
+    color: Optional[str]
+
+
+class BoardSection(BaseModel):
+    etag: str
+    # None – plansza nie zmieniła się od podanego board_etag
+    tiles: Optional[List[TaskOut]]
+
+
+class PlayersSection(BaseModel):
+    etag: str
+    # None – gracze nie zmienili się od podanego players_etag
+    items: Optional[List[PlayerOut]]
+
+
+class MessagesSection(BaseModel):
+    # id ostatniej wiadomości – do przekazania jako after_id przy kolejnym odświeżeniu
+    cursor: Optional[int]
+    items: List[MessageOut]
+
+
+class RoomStateOut(BaseModel):
+    room_id: int
+    done: bool
+    winner_uid: Optional[int]
+    board: BoardSection
+    players: PlayersSection
+    messages: MessagesSection
+
+
+# ===== Moderation =====
+
+
+class MessageSearchHit(MessageOut):
+    room_id: int
+    # mniejszy = lepsze dopasowanie
+    rank: float
+
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchHit]
+    # do przekazania jako cursor po następną stronę; None – koniec wyników
+    next_cursor: Optional[str]
@@ -0,0 +1,163 @@
+# app/search.py
+"""
+Pełnotekstowe wyszukiwanie w wiadomościach czatu.
+
+SQLite: wirtualna tabela FTS5 messages_fts (external content = messages)
+utrzymywana triggerami. Postgres: generowana kolumna tsvector + indeks GIN.
+Paginacja keysetowa po (rank, id) – kursor nie zależy od OFFSET.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Connection
+
+SEARCH_PAGE_SIZE = 50
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content='messages',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_messages_content_tsv
+        ON messages USING GIN (content_tsv)
+    """,
+]
+
+
+def ensure_search_index(conn: Connection) -> None:
+    """Tworzy indeks pełnotekstowy (idempotentnie) i wypełnia go przy pierwszym razie."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'")
+        ).first()
+        if existed:
+            # tabela i triggery powstają razem – przy kolejnych startach nic do roboty
+            return
+        for ddl in _SQLITE_DDL:
+            conn.execute(text(ddl))
+        # wiadomości sprzed utworzenia indeksu
+        conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for ddl in _POSTGRES_DDL:
+            conn.execute(text(ddl))
+
+
+def _fts5_query(q: str) -> str:
+    # każde słowo jako fraza w cudzysłowie – użytkownik nie wstrzyknie składni FTS5;
+    # ostatnie słowo prefiksowo, żeby działało wyszukiwanie w trakcie pisania
+    words = re.findall(r"\w+", q)
+    if not words:
+        return ""
+    terms = ['"%s"' % w for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_sql(
+    dialect: str,
+    q: str,
+    room_id: Optional[int],
+    user_id: Optional[int],
+    after: Optional[tuple[float, int]],
+    order: str,
+    limit: int,
+):
+    """
+    Zwraca (sql, params). Wiersze: id, room_id, user_id, username, content,
+    created_at, rank – rank rosnąco oznacza lepsze dopasowanie.
+    """
+    params: dict = {"limit": limit}
+    where: list[str] = []
+
+    if dialect == "postgresql":
+        source = (
+            "FROM messages m "
+            "JOIN users u ON u.id = m.user_id "
+            "CROSS JOIN plainto_tsquery('simple', :q) query"
+        )
+        # ts_rank: większy = lepszy; odwracamy, żeby sortować rosnąco jak bm25
+        rank = "-ts_rank(m.content_tsv, query)"
+        id_col = "m.id"
+        where.append("m.content_tsv @@ query")
+        params["q"] = q
+    else:
+        source = (
+            "FROM messages_fts f "
+            "JOIN messages m ON m.id = f.rowid "
+            "JOIN users u ON u.id = m.user_id"
+        )
+        rank = "bm25(messages_fts)"
+        # FTS5 potrafi iść po rowid malejąco bez sortowania wszystkich trafień
+        id_col = "f.rowid"
+        where.append("messages_fts MATCH :q")
+        params["q"] = _fts5_query(q)
+
+    if room_id is not None:
+        where.append("m.room_id = :room_id")
+        params["room_id"] = room_id
+    if user_id is not None:
+        where.append("m.user_id = :user_id")
+        params["user_id"] = user_id
+
+    if order == "recent":
+        # najnowsze najpierw – czyta indeks po id, tanie przy milionach trafień
+        if after is not None:
+            where.append(f"{id_col} < :after_id")
+            params["after_id"] = after[1]
+        order_by = f"{id_col} DESC"
+    else:
+        if after is not None:
+            where.append(
+                f"({rank} > :after_rank OR ({rank} = :after_rank AND m.id > :after_id))"
+            )
+            params["after_rank"], params["after_id"] = after
+        order_by = "rank, m.id"
+
+    sql = (
+        "SELECT m.id, m.room_id, m.user_id, u.username, m.content, m.created_at, "
+        f"{rank} AS rank {source} "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY {order_by} LIMIT :limit"
+    )
+    return text(sql).columns(created_at=DateTime), params
+
+
+def encode_cursor(rank: float, msg_id: int) -> str:
+    return f"{rank!r}:{msg_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    rank, msg_id = cursor.rsplit(":", 1)
+    return float(rank), int(msg_id)
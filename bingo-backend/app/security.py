@@ -1,6 +1,8 @@
 # app/security.py
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+import asyncio
 import os
 import hashlib
 import hmac
@@ -8,10 +10,19 @@ import hmac
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .db import get_db
+from .db import (
+    AsyncSessionLocal,
+    SessionLocal,
+    get_async_db,
+    get_db,
+    get_read_async_db,
+    get_read_db,
+)
 from . import models
+from .tracing import span, traced
 
 # ===== JWT config =====
 
@@ -21,12 +32,27 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# moderatorzy: adresy email oddzielone przecinkami, np. BINGO_MODERATORS=a@x.pl,b@x.pl
+MODERATOR_EMAILS = {
+    e.strip().lower() for e in os.getenv("BINGO_MODERATORS", "").split(",") if e.strip()
+}
+# administratorzy (narzędzia diagnostyczne) – BINGO_ADMINS, ten sam format
+ADMIN_EMAILS = {
+    e.strip().lower() for e in os.getenv("BINGO_ADMINS", "").split(",") if e.strip()
+}
+
 # ===== PBKDF2 config =====
 
 PBKDF2_ALGORITHM = "sha256"
 PBKDF2_ITERATIONS = 100_000
 PBKDF2_SALT_BYTES = 16  # 128-bit salt
 
+# osobna pula na PBKDF2 – hashowanie nie zajmuje wątków z puli anyio,
+# a pbkdf2_hmac zwalnia GIL, więc wątki liczą równolegle
+_hash_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 2, thread_name_prefix="pbkdf2"
+)
+
 
 def _pbkdf2_hash_password(password: str) -> str:
     """
@@ -83,6 +109,7 @@ def _pbkdf2_verify_password(password: str, hashed: str) -> bool:
 # ===== API, które używa reszta kodu =====
 
 
+@traced("security.pbkdf2_hash")
 def hash_password(password: str) -> str:
     """
     Używane przy rejestracji: zamienia plain hasło na hash do zapisania w bazie.
@@ -90,6 +117,7 @@ def hash_password(password: str) -> str:
     return _pbkdf2_hash_password(password)
 
 
+@traced("security.pbkdf2_verify")
 def verify_password(plain: str, hashed: str) -> bool:
     """
     Używane przy logowaniu: sprawdza, czy podane hasło pasuje do hasha z bazy.
@@ -97,6 +125,25 @@ def verify_password(plain: str, hashed: str) -> bool:
     return _pbkdf2_verify_password(plain, hashed)
 
 
+async def hash_password_async(password: str) -> str:
+    """
+    Jak hash_password, ale dla endpointów async – nie blokuje pętli zdarzeń.
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor nie przenosi contextvars – span obejmuje kolejkę i liczenie
+    with span("security.pbkdf2_hash"):
+        return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """
+    Jak verify_password, ale dla endpointów async – nie blokuje pętli zdarzeń.
+    """
+    loop = asyncio.get_running_loop()
+    with span("security.pbkdf2_verify"):
+        return await loop.run_in_executor(_hash_executor, verify_password, plain, hashed)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (
@@ -106,24 +153,115 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+@traced("auth.get_current_user")
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> models.User:
-    cred_exc = HTTPException(
+    return user_from_token(db, token)
+
+
+@traced("auth.get_current_user")
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    user_id = _user_id_from_token(token)
+    # commit tej sesji włącza odczyty z primary dla tego użytkownika (db.recent_writers)
+    db.info["user_id"] = user_id
+    user = await db.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+@traced("auth.get_current_user")
+def get_current_reader(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+) -> models.User:
+    """Jak get_current_user, ale na sesji do odczytu (replika) endpointu GET."""
+    user_id = _user_id_from_token(token)
+    db.info["user_id"] = user_id
+    user = db.get(models.User, user_id)
+    if user is None:
+        # konta założonego przed chwilą może jeszcze nie być na replice
+        with SessionLocal(expire_on_commit=False) as primary:
+            user = primary.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+@traced("auth.get_current_user")
+async def get_current_reader_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_async_db),
+) -> models.User:
+    """Jak get_current_user_async, ale na sesji do odczytu (replika) endpointu GET."""
+    user_id = _user_id_from_token(token)
+    db.info["user_id"] = user_id
+    user = await db.get(models.User, user_id)
+    if user is None:
+        async with AsyncSessionLocal() as primary:
+            user = await primary.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+async def get_current_user_id(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_async_db),
+) -> int:
+    """
+    Samo id z tokenu, bez zapytania o użytkownika – dla endpointów, które
+    i tak sprawdzają członkostwo w pokoju (albo obsługują żądanie bez bazy).
+    """
+    user_id = _user_id_from_token(token)
+    db.info["user_id"] = user_id
+    return user_id
+
+
+def user_from_token(db: Session, token: str) -> models.User:
+    user_id = _user_id_from_token(token)
+    db.info["user_id"] = user_id
+    user = db.get(models.User, user_id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _user_id_from_token(token: str) -> int:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
-            raise cred_exc
-    except JWTError:
-        raise cred_exc
+            raise _credentials_exception()
+        return int(user_id)
+    except (JWTError, ValueError) as exc:
+        raise _credentials_exception() from exc
 
-    user = db.get(models.User, user_id)
-    if user is None:
-        raise cred_exc
+
+async def get_current_moderator(
+    user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if user.email.lower() not in MODERATOR_EMAILS:
+        raise HTTPException(status_code=403, detail="Moderator access required")
+    return user
+
+
+async def get_current_admin(
+    user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
     return user
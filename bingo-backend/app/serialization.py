@@ -0,0 +1,67 @@
+# app/serialization.py
+"""
+Szybka ścieżka odpowiedzi JSON dla endpointów list (pokoje, plansza, chat).
+
+Endpoint, który zwraca FastJSONResponse, omija ponowną walidację przez
+response_model – dlatego używamy go tylko dla danych zbudowanych przez nas
+samych (słowniki z bazy), nigdy dla danych od klienta.
+"""
+from datetime import datetime
+from functools import lru_cache
+import json
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny – bez niego zostaje stdlib json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # bez msgpack zawsze odpowiadamy JSON-em
+    msgpack = None
+
+MESSAGE_DATE_FORMAT = "%H:%M %d-%m-%Y"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def negotiated_response(request: Request, content: Any) -> Response:
+    """
+    FastJSONResponse albo MessagePack, jeśli klient poprosił o niego w Accept.
+    """
+    accept = request.headers.get("accept", "")
+    if msgpack is not None and any(t in accept for t in MSGPACK_MEDIA_TYPES):
+        response = MsgPackResponse(content)
+    else:
+        response = FastJSONResponse(content)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+@lru_cache(maxsize=65536)
+def format_timestamp(dt: datetime) -> str:
+    # ten sam znacznik czasu formatujemy raz, a nie przy każdym odpytaniu chatu
+    return dt.strftime(MESSAGE_DATE_FORMAT)
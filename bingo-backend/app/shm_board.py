@@ -0,0 +1,296 @@
+# app/shm_board.py
+"""
+Plansze aktywnych pokoi we współdzielonej pamięci (mmap) – opcjonalnie.
+
+Włączane przez BINGO_SHM_BOARDS=/dev/shm/bingo-boards: wszystkie workery
+uvicorna na hoście mapują ten sam plik, więc room_tasks w każdym z nich
+obsłuży planszę bez zapytań do bazy.
+
+Plik to tablica haszująca (adresowanie otwarte) slotów stałej wielkości:
+numer sekwencji (seqlock), room_id, wersja, flaga końca gry, 25 assignment id,
+25 task id, 25 finishing_uid (0 = wolne) i do 5 graczy z indeksem koloru.
+
+- odczyt bez blokad: kopia slotu między dwoma odczytami tej samej, parzystej
+  sekwencji; jeśli pisarz był w trakcie – ponawiamy, a w ostateczności
+  wracamy do bazy,
+- zapis (tylko po commicie w ścieżkach rooms.py) pod flock na pliku, więc
+  pisze jeden proces naraz – handlery async wołają go przez asyncio.to_thread.
+  Pola są scalane (zajęte pole nigdy nie wraca do wolnego), dlatego
+  spóźniony zapis starszego stanu niczego nie cofa, a wersja nie maleje.
+- sondowanie ma stałą długość (MAX_PROBE) – brak planszy kosztuje
+  najwyżej MAX_PROBE odczytów nagłówka, a przy pełnym sąsiedztwie put()
+  zwraca False i pokój idzie z bazy. Usunięte sloty (nagrobki) są liczone
+  w nagłówku pliku; gdy jest ich więcej niż TOMBSTONE_RATIO tablicy,
+  remove() przepisuje żywe plansze na nowo (w wątku zadań, nie w pętli
+  zdarzeń). W trakcie czytelnik może nie znaleźć planszy – wraca wtedy do bazy.
+
+Baza pozostaje źródłem prawdy; plik w /dev/shm znika z restartem hosta.
+Po odtworzeniu bazy z kopii trzeba go usunąć.
+"""
+from contextlib import contextmanager
+import mmap
+import os
+import struct
+import threading
+from typing import NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # bez flock (Windows) współdzielone plansze są wyłączone
+    fcntl = None
+
+from .board import BOARD_SIZE
+
+TILES = BOARD_SIZE * BOARD_SIZE
+MAX_PLAYERS = 5
+# liczba slotów (aktywnych pokoi); plik ma ~ SLOTS * 0.4 KB
+SHM_SLOTS = int(os.getenv("BINGO_SHM_SLOTS", "65536"))
+# ile razy czytelnik ponawia odczyt, zanim odda sprawę bazie
+READ_RETRIES = 16
+# najdłuższe sondowanie (slotów) przy szukaniu i wstawianiu
+MAX_PROBE = 64
+# przy takim udziale nagrobków remove() przepisuje tablicę
+TOMBSTONE_RATIO = 0.25
+
+_MAGIC = 0xB1A60002
+_HEADER = struct.Struct("<IIII")  # magic, liczba slotów, żywe plansze, nagrobki
+# seq, room_id (0 – pusty, -1 – usunięty), version, done
+_SLOT_HEAD = struct.Struct("<IiIi")
+_SLOT_BODY = struct.Struct(f"<{TILES}i{TILES}i{TILES}i{MAX_PLAYERS}i{MAX_PLAYERS}b")
+_SLOT_SIZE = (_SLOT_HEAD.size + _SLOT_BODY.size + 7) // 8 * 8
+
+_EMPTY = 0
+_DELETED = -1
+
+
+class BoardSnapshot(NamedTuple):
+    room_id: int
+    # liczba zajętych pól – rośnie z każdym przejęciem
+    version: int
+    done: bool
+    asg_ids: tuple
+    task_ids: tuple
+    # finishing_uid kolejnych pól, None – wolne
+    uids: tuple
+    # user_id -> indeks koloru w PLAYER_COLORS (-1 – brak)
+    players: dict
+
+
+class SharedBoards:
+    def __init__(self, path: str, slots: int = SHM_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        size = _HEADER.size + slots * _SLOT_SIZE
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size:
+                # pierwszy worker (albo zmiana BINGO_SHM_SLOTS) – czysta tablica
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+            magic, stored_slots = _HEADER.unpack_from(self._mm, 0)[:2]
+            if magic != _MAGIC or stored_slots != slots:
+                self._mm[:] = bytes(size)
+                _HEADER.pack_into(self._mm, 0, _MAGIC, slots, 0, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # ===== odczyt (bez blokad) =====
+
+    def get(self, room_id: int) -> Optional[BoardSnapshot]:
+        offset = self._find(room_id)
+        if offset is None:
+            return None
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq = _SLOT_HEAD.unpack_from(mm, offset)[0]
+            if seq & 1:
+                continue
+            raw = mm[offset : offset + _SLOT_SIZE]
+            if _SLOT_HEAD.unpack_from(mm, offset)[0] != seq:
+                continue
+            _, slot_room, version, done = _SLOT_HEAD.unpack_from(raw, 0)
+            if slot_room != room_id:
+                return None
+            return _snapshot(slot_room, version, done, _SLOT_BODY.unpack_from(raw, _SLOT_HEAD.size))
+        return None
+
+    def _find(self, room_id: int) -> Optional[int]:
+        for offset in self._probe(room_id):
+            slot_room = _SLOT_HEAD.unpack_from(self._mm, offset)[1]
+            if slot_room == room_id:
+                return offset
+            if slot_room == _EMPTY:
+                return None
+        return None
+
+    def _probe(self, room_id: int):
+        start = (room_id * 2654435761) % self.slots
+        for i in range(min(MAX_PROBE, self.slots)):
+            yield _HEADER.size + ((start + i) % self.slots) * _SLOT_SIZE
+
+    def stats(self) -> dict:
+        _, slots, live, tombstones = _HEADER.unpack_from(self._mm, 0)
+        return {"slots": slots, "live": live, "tombstones": tombstones}
+
+    # ===== zapis (flock) =====
+
+    def put(
+        self, room_id: int, asg_ids, task_ids, uids, players: dict,
+        done: bool = False, create: bool = True,
+    ) -> bool:
+        """
+        Wstawia albo scala planszę (kolejność pól jak asg_ids). create=False –
+        tylko plansza, która już jest. False, gdy niczego nie zapisano.
+        """
+        with self._writer():
+            offset = self._find(room_id)
+            current = self.get(room_id) if offset is not None else None
+            if offset is None:
+                if not create:
+                    return False
+                offset = self._free_slot(room_id)
+                if offset is None:
+                    return False
+                slot_room = _SLOT_HEAD.unpack_from(self._mm, offset)[1]
+                self._count(live=1, tombstones=-1 if slot_room == _DELETED else 0)
+            if current is not None:
+                uids = [new if new is not None else old for new, old in zip(uids, current.uids)]
+                players = {**current.players, **players}
+                done = done or current.done
+            self._write(offset, room_id, asg_ids, task_ids, uids, players, done)
+            return True
+
+    def add_player(self, room_id: int, user_id: int, color_index: int) -> None:
+        with self._writer():
+            offset = self._find(room_id)
+            current = self.get(room_id) if offset is not None else None
+            if current is None:
+                return
+            players = {**current.players, user_id: color_index}
+            self._write(offset, room_id, current.asg_ids, current.task_ids, current.uids,
+                        players, current.done)
+
+    def remove(self, room_id: int) -> None:
+        with self._writer():
+            offset = self._find(room_id)
+            if offset is None:
+                return
+            self._set_head(offset, _DELETED)
+            live, tombstones = self._count(live=-1, tombstones=1)
+            if tombstones > self.slots * TOMBSTONE_RATIO:
+                self._compact()
+
+    def _count(self, live: int = 0, tombstones: int = 0) -> tuple[int, int]:
+        magic, slots, n_live, n_tombstones = _HEADER.unpack_from(self._mm, 0)
+        n_live, n_tombstones = max(n_live + live, 0), max(n_tombstones + tombstones, 0)
+        _HEADER.pack_into(self._mm, 0, magic, slots, n_live, n_tombstones)
+        return n_live, n_tombstones
+
+    def _set_head(self, offset: int, room_id: int) -> None:
+        # zmiana room_id slotu (usunięcie, czyszczenie) pod seqlockiem
+        seq, old_room = _SLOT_HEAD.unpack_from(self._mm, offset)[:2]
+        _SLOT_HEAD.pack_into(self._mm, offset, seq + 1, old_room, 0, 0)
+        _SLOT_HEAD.pack_into(self._mm, offset, seq + 2, room_id, 0, 0)
+
+    def _compact(self) -> None:
+        """Wstawia żywe plansze od nowa do pustej tablicy (bez nagrobków)."""
+        mm = self._mm
+        live = []
+        for i in range(self.slots):
+            offset = _HEADER.size + i * _SLOT_SIZE
+            slot_room = _SLOT_HEAD.unpack_from(mm, offset)[1]
+            if slot_room > 0:
+                live.append((slot_room, bytes(mm[offset : offset + _SLOT_SIZE])))
+            if slot_room != _EMPTY:
+                self._set_head(offset, _EMPTY)
+
+        kept = 0
+        for room_id, raw in live:
+            offset = self._free_slot(room_id)
+            if offset is None:
+                # bez miejsca w zasięgu sondowania – ten pokój pójdzie z bazy
+                continue
+            _, _, version, done = _SLOT_HEAD.unpack_from(raw, 0)
+            seq = _SLOT_HEAD.unpack_from(mm, offset)[0]
+            _SLOT_HEAD.pack_into(mm, offset, seq + 1, room_id, version, done)
+            mm[offset + _SLOT_HEAD.size : offset + _SLOT_SIZE] = raw[_SLOT_HEAD.size :]
+            _SLOT_HEAD.pack_into(mm, offset, seq + 2, room_id, version, done)
+            kept += 1
+
+        magic, slots = _HEADER.unpack_from(mm, 0)[:2]
+        _HEADER.pack_into(mm, 0, magic, slots, kept, 0)
+
+    def _free_slot(self, room_id: int) -> Optional[int]:
+        for offset in self._probe(room_id):
+            if _SLOT_HEAD.unpack_from(self._mm, offset)[1] in (_EMPTY, _DELETED):
+                return offset
+        return None
+
+    def _write(self, offset, room_id, asg_ids, task_ids, uids, players, done) -> None:
+        mm = self._mm
+        seq = _SLOT_HEAD.unpack_from(mm, offset)[0]
+        version = sum(1 for uid in uids if uid is not None)
+        player_items = list(players.items())[:MAX_PLAYERS]
+        player_items += [(0, -1)] * (MAX_PLAYERS - len(player_items))
+
+        # nieparzysta sekwencja – czytelnicy wiedzą, że slot jest w trakcie zapisu
+        _SLOT_HEAD.pack_into(mm, offset, seq + 1, room_id, version, int(done))
+        _SLOT_BODY.pack_into(
+            mm,
+            offset + _SLOT_HEAD.size,
+            *_padded(asg_ids),
+            *_padded(task_ids),
+            *(_padded([uid or 0 for uid in uids])),
+            *(uid for uid, _ in player_items),
+            *(color for _, color in player_items),
+        )
+        _SLOT_HEAD.pack_into(mm, offset, seq + 2, room_id, version, int(done))
+
+    @contextmanager
+    def _writer(self):
+        # wątki tego procesu – threading.Lock, inne procesy – flock
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def _padded(values) -> list:
+    values = list(values)[:TILES]
+    return values + [0] * (TILES - len(values))
+
+
+def _snapshot(room_id, version, done, body) -> BoardSnapshot:
+    asg_ids = body[:TILES]
+    task_ids = body[TILES : 2 * TILES]
+    uids = body[2 * TILES : 3 * TILES]
+    player_ids = body[3 * TILES : 3 * TILES + MAX_PLAYERS]
+    colors = body[3 * TILES + MAX_PLAYERS :]
+    # plansze mniejsze niż 25 pól (stare pokoje) kończą się zerami
+    n = sum(1 for a in asg_ids if a)
+    return BoardSnapshot(
+        room_id=room_id,
+        version=version,
+        done=bool(done),
+        asg_ids=asg_ids[:n],
+        task_ids=task_ids[:n],
+        uids=tuple(uid or None for uid in uids[:n]),
+        players={uid: color for uid, color in zip(player_ids, colors) if uid},
+    )
+
+
+def _open_from_env() -> Optional[SharedBoards]:
+    path = os.getenv("BINGO_SHM_BOARDS")
+    if not path or fcntl is None:
+        return None
+    return SharedBoards(path)
+
+
+# None – współdzielone plansze wyłączone, rooms.py używa samej bazy
+board_store = _open_from_env()
@@ -0,0 +1,171 @@
+# app/startup.py
+"""
+Rozgrzewka procesu przed przyjęciem ruchu (wywoływana z lifespan w main.py).
+
+1. schemat – create_all, kolumny, indeksy i indeks wyszukiwania tylko, gdy
+   czegoś brakuje,
+2. pule połączeń (primary i repliki) – otwieramy je od razu, a nie przy
+   pierwszych żądaniach,
+3. cache – katalog zadań i lobby (otwarte pokoje z liczbą graczy).
+"""
+import asyncio
+import logging
+import time
+
+from sqlalchemy import UniqueConstraint, inspect, text
+
+from .catalog import task_catalog
+from .db import (
+    Base,
+    SessionLocal,
+    async_engine,
+    async_replica_engines,
+    engine,
+    replica_engines,
+)
+from .lobby import lobby
+from .search import ensure_search_index
+
+# tyle połączeń trzyma domyślny QueuePool (pool_size=5)
+POOL_WARM_CONNECTIONS = 5
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def prepare_schema() -> bool:
+    """Tworzy brakujące tabele i indeksy. Zwraca True, jeśli była jakaś praca do zrobienia."""
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        missing = set(Base.metadata.tables) - existing
+        if missing:
+            # seed zadań (models.insert_data) odpala się przy tworzeniu tabeli tasks
+            Base.metadata.create_all(bind=conn)
+        # indeksy dodane do modeli po założeniu bazy
+        for table in Base.metadata.sorted_tables:
+            if table.name in missing:
+                continue
+            for name in ensure_columns(conn, table):
+                missing.add(name)
+            present = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in present:
+                    index.create(conn)
+                    missing.add(index.name)
+            for name in ensure_unique_indexes(conn, table):
+                missing.add(name)
+        ensure_search_index(conn)
+    return bool(missing)
+
+
+def ensure_columns(conn, table) -> list[str]:
+    """
+    Kolumny dodane do modelu po założeniu tabeli. Każda taka kolumna musi
+    mieć server_default – wtedy ADD COLUMN wypełni istniejące wiersze.
+    Zwraca nazwy dodanych kolumn.
+    """
+    present = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in present:
+            continue
+        if column.server_default is None:
+            raise RuntimeError(f"{table.name}.{column.name} needs a server_default to be added")
+        ddl = (
+            f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+            f"{column.type.compile(dialect=conn.dialect)} "
+            f"DEFAULT {column.server_default.arg}"
+        )
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.execute(text(ddl))
+        added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def ensure_unique_indexes(conn, table) -> list[str]:
+    """
+    UniqueConstraint dodane do modelu po założeniu tabeli. SQLite nie ma
+    ALTER TABLE ... ADD CONSTRAINT, więc zakładamy równoważny unikalny indeks.
+    Zwraca nazwy utworzonych indeksów.
+    """
+    inspector = inspect(conn)
+    present = {tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table.name)}
+    present |= {
+        tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name) if ix["unique"]
+    }
+    created = []
+    for constraint in table.constraints:
+        if not isinstance(constraint, UniqueConstraint):
+            continue
+        columns = [c.name for c in constraint.columns]
+        if tuple(columns) in present:
+            continue
+        cols = ", ".join(columns)
+        duplicate = conn.execute(
+            text(
+                f"SELECT 1 FROM {table.name} WHERE "
+                + " AND ".join(f"{c} IS NOT NULL" for c in columns)
+                + f" GROUP BY {cols} HAVING count(*) > 1 LIMIT 1"
+            )
+        ).first()
+        if duplicate is not None:
+            # indeksu nie da się założyć, dopóki ktoś nie usunie duplikatów
+            logger.warning("Duplicate rows in %s (%s), skipping %s", table.name, cols, constraint.name)
+            continue
+        conn.execute(
+            text(f"CREATE UNIQUE INDEX IF NOT EXISTS {constraint.name} ON {table.name} ({cols})")
+        )
+        created.append(constraint.name)
+    return created
+
+
+def warm_sync_pool(n: int = POOL_WARM_CONNECTIONS) -> None:
+    for eng in (engine, *replica_engines):
+        # wszystkie naraz – inaczej pula oddawałaby w kółko to samo połączenie
+        conns = [eng.connect() for _ in range(n)]
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+            conn.close()
+
+
+async def warm_async_pool(n: int = POOL_WARM_CONNECTIONS) -> None:
+    for eng in (async_engine, *async_replica_engines):
+        conns = await asyncio.gather(*(eng.connect() for _ in range(n)))
+        for conn in conns:
+            await conn.execute(text("SELECT 1"))
+            await conn.close()
+
+
+def preload_caches() -> None:
+    with SessionLocal() as db:
+        task_catalog.ensure_loaded(db)
+        lobby.ensure_loaded(db)
+
+
+async def warm_up() -> dict[str, float]:
+    """Wykonuje wszystkie kroki i zwraca ich czasy w milisekundach."""
+    timings: dict[str, float] = {}
+
+    async def step(name: str, fn, *args):
+        start = time.perf_counter()
+        if asyncio.iscoroutinefunction(fn):
+            await fn(*args)
+        else:
+            # kroki synchroniczne nie blokują pętli zdarzeń
+            await asyncio.to_thread(fn, *args)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    await step("schema", prepare_schema)
+    await step("sync_pool", warm_sync_pool)
+    await step("async_pool", warm_async_pool)
+    await step("caches", preload_caches)
+    timings["total"] = round(sum(timings.values()), 1)
+
+    logger.info(
+        "Warm-up %.1f ms (%s); %d tasks, %d open rooms",
+        timings["total"],
+        ", ".join(f"{k} {v} ms" for k, v in timings.items() if k != "total"),
+        len(task_catalog),
+        len(lobby.rooms()),
+    )
+    return timings
@@ -0,0 +1,392 @@
+# app/tracing.py
+"""
+Śledzenie żądań: drzewo spanów na żądanie (HTTP -> uwierzytelnienie ->
+zapytania SQL / commit / leniwe ładowanie relacji, PBKDF2).
+
+- TracingMiddleware decyduje o próbkowaniu (BINGO_TRACE_SAMPLE, 0–1, albo
+  nagłówek traceparent z flagą sampled) i otwiera span główny. Bieżący span
+  siedzi w contextvar, więc dziedziczą go wątki anyio i greenlety SQLAlchemy.
+- span() / @traced – spany w kodzie; bez aktywnego śladu to jedno
+  ContextVar.get() i powrót.
+- zapytania: zdarzenia silników z db.py (instalowane przy pierwszym
+  włączeniu), commit sesji, leniwe ładowanie relacji (do_orm_execute).
+- eksport w osobnym wątku: JSON zgodny z OTLP/HTTP (jeden ślad na linię) do
+  pliku BINGO_TRACE_FILE i/lub POST na BINGO_TRACE_OTLP_URL
+  (np. http://localhost:4318/v1/traces).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+from urllib import request as urlrequest
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+TRACE_SAMPLE = float(os.getenv("BINGO_TRACE_SAMPLE", "0"))
+TRACE_FILE = os.getenv("BINGO_TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_URL = os.getenv("BINGO_TRACE_OTLP_URL")
+SERVICE_NAME = "bingo-api"
+# ile skończonych śladów czeka na eksport; nadmiar jest odrzucany
+EXPORT_QUEUE_SIZE = 1000
+# dłuższe zapytania SQL są przycinane w atrybucie db.statement
+MAX_STATEMENT_LENGTH = 1000
+
+# rodzaje spanów OTLP
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+logger = logging.getLogger("uvicorn.error")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("bingo_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str],
+                 kind: int = KIND_INTERNAL, attributes: Optional[dict] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+        # lista.append jest atomowe – spany mogą kończyć się w różnych wątkach
+        trace.spans.append(self)
+
+    def child(self, name: str, kind: int = KIND_INTERNAL, **attributes) -> "Span":
+        return Span(self.trace, name, self.span_id, kind, attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = repr(error)[:300]
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: list[Span] = []
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Span potomny bieżącego; bez aktywnego śladu nic nie robi (yield None)."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def traced(name: str):
+    """Dekorator: całe wywołanie funkcji (sync albo async) jako span."""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# ===== eksport =====
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_json(trace: Trace) -> dict:
+    """Ślad w formacie ExportTraceServiceRequest (OTLP/HTTP JSON)."""
+    spans = []
+    for s in trace.spans:
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            # span niezamknięty (np. commit przerwany wyjątkiem) kończymy z resztą
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        spans.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                        {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = TRACE_SAMPLE, path: Optional[str] = TRACE_FILE,
+                 otlp_url: Optional[str] = TRACE_OTLP_URL):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.otlp_url = otlp_url
+        self._queue: queue.Queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._instrumented = False
+        self.exported = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start(self) -> None:
+        if self.enabled:
+            self._start()
+
+    def configure(self, sample_rate: float) -> None:
+        """Zmiana próbkowania w locie (tylko ten proces)."""
+        self.sample_rate = sample_rate
+        self.start()
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def finish(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if not self._instrumented:
+                instrument_sqlalchemy()
+                self._instrumented = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._export_loop, name="trace-export",
+                                                daemon=True)
+                self._thread.start()
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                payload = json.dumps(otlp_json(trace), separators=(",", ":"))
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload + "\n")
+                if self.otlp_url:
+                    req = urlrequest.Request(self.otlp_url, data=payload.encode(),
+                                             headers={"Content-Type": "application/json"})
+                    urlrequest.urlopen(req, timeout=5).close()
+                self.exported += 1
+            except Exception:
+                self.dropped += 1
+                logger.exception("Trace export failed")
+
+    def metrics(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "file": self.path,
+            "otlp_url": self.otlp_url,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+
+tracer = Tracer()
+
+
+# ===== HTTP =====
+
+
+def _parse_traceparent(value: str) -> Optional[tuple[str, str]]:
+    # 00-<trace_id 32 hex>-<parent_id 16 hex>-<flags>
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    if not int(parts[3], 16) & 1:
+        return None
+    return parts[1], parts[2]
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not tracer.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                try:
+                    parent = _parse_traceparent(value.decode("latin-1"))
+                except ValueError:
+                    parent = None
+                break
+        if parent is None and not tracer.should_sample():
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(parent[0] if parent else None)
+        root = Span(trace, f"{scope['method']} {scope['path']}", parent[1] if parent else None,
+                    KIND_SERVER, {"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", f"00-{trace.trace_id}-{root.span_id}-01".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.end(e)
+            raise
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                # nazwa wg szablonu ścieżki – ślady /rooms/1 i /rooms/2 grupują się razem
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            root.end()
+            tracer.finish(trace)
+
+
+# ===== SQLAlchemy =====
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or context is None:
+        return
+    # nie ustawiamy _current – greenlet silnika async dzieli kontekst z wywołującym
+    context._trace_span = parent.child(
+        "db.query",
+        KIND_CLIENT,
+        **{
+            "db.system": conn.dialect.name,
+            "db.name": conn.engine.url.database or "",
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        },
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    s = getattr(context, "_trace_span", None)
+    if s is not None:
+        if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+            s.attributes["db.rowcount"] = cursor.rowcount
+        s.end()
+
+
+def _handle_error(exception_context):
+    s = getattr(exception_context.execution_context, "_trace_span", None)
+    if s is not None:
+        s.end(exception_context.original_exception)
+
+
+def _before_commit(session):
+    parent = _current.get()
+    if parent is not None:
+        # w SQLite tu czeka się na blokadę zapisu bazy
+        session.info["_trace_commit"] = parent.child("db.commit", KIND_CLIENT)
+
+
+def _after_commit(session):
+    s = session.info.pop("_trace_commit", None)
+    if s is not None:
+        s.end()
+
+
+def _after_rollback(session):
+    s = session.info.pop("_trace_commit", None)
+    if s is not None:
+        s.end(RuntimeError("rollback"))
+
+
+def _orm_execute(orm_execute_state):
+    if _current.get() is None or not orm_execute_state.is_relationship_load:
+        return None
+    mapper = orm_execute_state.bind_mapper
+    with span("orm.lazy_load", entity=mapper.class_.__name__ if mapper is not None else ""):
+        return orm_execute_state.invoke_statement()
+
+
+def instrument_sqlalchemy() -> None:
+    """Podpina zdarzenia pod wszystkie silniki z db.py i pod sesje."""
+    from .db import async_engine, async_replica_engines, engine, replica_engines
+
+    engines = [engine, *replica_engines, async_engine.sync_engine,
+               *(e.sync_engine for e in async_replica_engines)]
+    for eng in engines:
+        event.listen(eng, "before_cursor_execute", _before_cursor_execute)
+        event.listen(eng, "after_cursor_execute", _after_cursor_execute)
+        event.listen(eng, "handle_error", _handle_error)
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    event.listen(Session, "do_orm_execute", _orm_execute)
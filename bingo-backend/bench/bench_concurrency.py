@@ -0,0 +1,151 @@
+"""
+Pojemność serwera przy wielu równoczesnych klientach odpytujących planszę i chat.
+
+Każdy klient w pętli robi to, co RoomScreen: GET /rooms/{id}/tasks oraz
+GET /rooms/{id}/messages. Dla kolejnych poziomów współbieżności wypisujemy
+przepustowość, p50/p99 i liczbę błędów. Żeby porównać "przed/po", wystarczy
+uruchomić benchmark na dwóch commitach.
+
+Wymaga httpx (pip install httpx). Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_concurrency --spawn
+    python -m bench.bench_concurrency --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _setup(client: httpx.AsyncClient) -> tuple[dict, int]:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    await client.post(
+        "/auth/register", json={"email": email, "password": "bench", "username": "bench"}
+    )
+    r = await client.post("/auth/login", json={"email": email, "password": "bench"})
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    r = await client.post(
+        "/rooms", json={"name": "bench", "category": "Sport"}, headers=headers
+    )
+    room_id = r.json()["id"]
+    for i in range(50):
+        await client.post(
+            f"/rooms/{room_id}/messages", json={"content": f"msg {i}"}, headers=headers
+        )
+    return headers, room_id
+
+
+async def _poller(client, headers, room_id, deadline, latencies, errors):
+    paths = (f"/rooms/{room_id}/tasks", f"/rooms/{room_id}/messages")
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % 2]
+        i += 1
+        start = time.perf_counter()
+        try:
+            r = await client.get(path, headers=headers)
+            if r.status_code != 200:
+                errors.append(r.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(url: str, concurrency: int, duration: float, headers, room_id):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        latencies: list[float] = []
+        errors: list = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(
+                _poller(client, headers, room_id, deadline, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+
+    latencies.sort()
+    n = len(latencies)
+    p50 = latencies[n // 2] * 1000 if n else float("nan")
+    p99 = latencies[min(n - 1, int(n * 0.99))] * 1000 if n else float("nan")
+    print(
+        f"{concurrency:6d} klientów  {n / duration:9.1f} req/s  "
+        f"p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  błędy {len(errors)}"
+    )
+
+
+def _spawn_server(port: int) -> tuple[subprocess.Popen, str]:
+    # osobny katalog – bingo.db jest względna do cwd, nie ruszamy bazy z repo
+    workdir = tempfile.mkdtemp(prefix="bingo-bench-")
+    src_db = os.path.join(BACKEND_DIR, "bingo.db")
+    if os.path.exists(src_db):
+        shutil.copy(src_db, os.path.join(workdir, "bingo.db"))
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--app-dir", BACKEND_DIR, "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=workdir,
+        env={
+            **os.environ,
+            # jeden użytkownik bije w API szybciej, niż pozwalają limity na konto
+            "BINGO_RATE_LIMITS": "0",
+            # kopia bazy ma stare otwarte pokoje – reaper zamykałby je w trakcie pomiaru
+            "BINGO_ROOM_IDLE_SECONDS": "0",
+            "BINGO_GAME_MAX_SECONDS": "0",
+        },
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(url + "/docs", timeout=0.5)
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    return proc, workdir
+
+
+async def main_async(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0) as client:
+        headers, room_id = await _setup(client)
+    for level in args.concurrency:
+        await run_level(args.url, level, args.duration, headers, room_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="uruchom uvicorn na kopii bazy")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[10, 50, 100, 200, 400]
+    )
+    args = parser.parse_args()
+
+    proc = workdir = None
+    if args.spawn:
+        proc, workdir = _spawn_server(args.port)
+        args.url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
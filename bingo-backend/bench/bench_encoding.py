@@ -0,0 +1,83 @@
+"""
+Rozmiar i koszt CPU kodowania typowych odpowiedzi: JSON / MessagePack,
+bez kompresji, z gzip i z brotli.
+
+Payloady: plansza 5x5, 100 wiadomości czatu, lobby ~200 pokoi.
+
+Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_encoding
+"""
+import random
+import timeit
+
+import msgpack
+
+from app.compression import compress
+from app.serialization import dumps
+
+WORDS = "bingo gol mecz karny atom fizyka piłka wynik sędzia nauka tabela sport".split()
+
+
+def board_payload() -> list[dict]:
+    return [
+        {
+            "assignment_id": 1000 + i,
+            "description": f"Zadanie {i}: " + " ".join(random.choices(WORDS, k=6)),
+            "finished_by": 1 if i % 3 == 0 else None,
+            "color": "#e11d48" if i % 3 == 0 else None,
+        }
+        for i in range(25)
+    ]
+
+
+def chat_payload() -> list[dict]:
+    return [
+        {
+            "id": 5000 + i,
+            "user_id": random.randint(1, 5),
+            "username": f"gracz{random.randint(1, 5)}",
+            "content": " ".join(random.choices(WORDS, k=random.randint(2, 12))),
+            "created_at": f"12:{i % 60:02d} 19-10-2026",
+        }
+        for i in range(100)
+    ]
+
+
+def lobby_payload() -> list[dict]:
+    return [
+        {
+            "id": i,
+            "name": f"Pokój {i} " + random.choice(WORDS),
+            "category": random.choice(("Nauka", "Sport")),
+            "max_players": 5,
+            "has_password": i % 10 == 0,
+            "players_count": random.randint(0, 5),
+        }
+        for i in range(200)
+    ]
+
+
+def variants(data) -> dict:
+    return {
+        "json": lambda: dumps(data),
+        "json+gzip": lambda: compress("gzip", dumps(data)),
+        "json+br": lambda: compress("br", dumps(data)),
+        "msgpack": lambda: msgpack.packb(data, use_bin_type=True),
+        "msgpack+gzip": lambda: compress("gzip", msgpack.packb(data, use_bin_type=True)),
+        "msgpack+br": lambda: compress("br", msgpack.packb(data, use_bin_type=True)),
+    }
+
+
+def main():
+    random.seed(1)
+    for name, data in (("plansza", board_payload()), ("chat", chat_payload()), ("lobby", lobby_payload())):
+        print(f"== {name}")
+        for label, fn in variants(data).items():
+            size = len(fn())
+            number = 500
+            t = timeit.timeit(fn, number=number)
+            print(f"  {label:14s} {size:7d} B   {t / number * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
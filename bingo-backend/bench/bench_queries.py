@@ -0,0 +1,134 @@
+"""
+Czasy zapytań endpointów na dużym zbiorze danych (z bench.gen_dataset).
+
+Aplikacja działa w procesie (TestClient) na wskazanej bazie. Dla każdego
+endpointu wypisujemy p50/p95 oraz plan każdego zapytania SQL, które wykonał
+(EXPLAIN QUERY PLAN w SQLite; na Postgresie EXPLAIN dla zapytań z silnika
+synchronicznego).
+
+Pokoje i użytkownicy do testu: pokój z największą liczbą wiadomości, pokój
+typowy (mediana) i użytkownik z największą liczbą założonych pokoi.
+
+Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_queries --url sqlite:///./scale-small.db
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+REPEAT = 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--no-plans", action="store_true")
+    args = parser.parse_args()
+
+    # db.py czyta adres bazy przy imporcie
+    os.environ["BINGO_DATABASE_URL"] = args.url
+    os.environ["BINGO_RATE_LIMITS"] = "0"
+    # wygenerowane pokoje są "stare" – reaper zamknąłby je przy starcie
+    os.environ["BINGO_ROOM_IDLE_SECONDS"] = "0"
+    os.environ["BINGO_GAME_MAX_SECONDS"] = "0"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, func, select, text
+
+    from app import models
+    from app.chat_cache import recent_messages
+    from app.db import SessionLocal, async_engine, engine
+    from app.main import app
+    from app.security import create_access_token
+
+    with SessionLocal() as db:
+        counts = (
+            select(models.Message.room_id, func.count().label("n"))
+            .group_by(models.Message.room_id)
+            .subquery()
+        )
+        ordered = db.execute(select(counts.c.room_id, counts.c.n).order_by(counts.c.n)).all()
+        hot_room, hot_n = ordered[-1]
+        typical_room, typical_n = ordered[len(ordered) // 2]
+        owner_id, owned = db.execute(
+            select(models.Room.owner_id, func.count().label("n"))
+            .group_by(models.Room.owner_id)
+            .order_by(text("n DESC"))
+            .limit(1)
+        ).one()
+        members = dict(
+            db.execute(
+                select(models.RoomMember.room_id, models.RoomMember.user_id).where(
+                    models.RoomMember.room_id.in_([hot_room, typical_room])
+                )
+            ).all()
+        )
+
+    def auth(user_id: int) -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    statements: list[tuple] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((conn.engine, statement, parameters))
+
+    for eng in (engine, async_engine.sync_engine):
+        event.listen(eng, "before_cursor_execute", capture)
+
+    cases = [
+        ("list_rooms", "/rooms", auth(owner_id), False),
+        (f"get_messages hot ({hot_n} wiad.)", f"/rooms/{hot_room}/messages",
+         auth(members[hot_room]), True),
+        (f"get_messages typowy ({typical_n} wiad.)", f"/rooms/{typical_room}/messages",
+         auth(members[typical_room]), True),
+        ("get_messages hot, before_id", f"/rooms/{hot_room}/messages?before_id={10**12}&limit=100",
+         auth(members[hot_room]), True),
+        ("room_tasks", f"/rooms/{hot_room}/tasks", auth(members[hot_room]), False),
+        (f"profile/me ({owned} pokoi)", "/profile/me", auth(owner_id), False),
+    ]
+
+    with TestClient(app) as client:
+        for name, path, headers, cold_chat in cases:
+            times = []
+            for _ in range(args.repeat):
+                if cold_chat:
+                    # mierzymy zapytania, nie bufor ostatnich wiadomości
+                    recent_messages.discard(int(path.split("/")[2]))
+                statements.clear()
+                start = time.perf_counter()
+                r = client.get(path, headers=headers)
+                times.append((time.perf_counter() - start) * 1000)
+                if r.status_code != 200:
+                    sys.exit(f"{path}: {r.status_code} {r.text[:200]}")
+            times.sort()
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            print(f"{name:40s} p50 {statistics.median(times):8.1f} ms   p95 {p95:8.1f} ms   "
+                  f"{len(r.content):>10,d} B")
+            if not args.no_plans:
+                _print_plans(statements)
+
+
+def _print_plans(statements):
+    from app.db import engine
+
+    sqlite = engine.dialect.name == "sqlite"
+    explain = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+    with engine.connect() as conn:
+        for source, statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            if not sqlite and source is not engine:
+                # parametry asyncpg ($1) nie pasują do sterownika synchronicznego
+                print("    (plan pominięty – zapytanie z silnika async) " + statement[:100])
+                continue
+            print("    " + " ".join(statement.split())[:150])
+            rows = conn.exec_driver_sql(explain + statement, parameters).all()
+            for row in rows:
+                print("      " + str(row[-1]))
+
+
+if __name__ == "__main__":
+    main()
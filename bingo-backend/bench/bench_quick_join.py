@@ -0,0 +1,42 @@
+"""
+Czas wyboru pokoju przez quick-join w zależności od liczby otwartych pokoi.
+
+Wypełnia indeks lobby sztucznymi pokojami (bez bazy) i mierzy
+Lobby.pick_open_room – czas powinien być stały niezależnie od rozmiaru.
+
+Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_quick_join
+"""
+import random
+import timeit
+
+from app import models
+from app.lobby import Lobby
+
+CATEGORIES = ("Nauka", "Sport")
+
+
+def build(n: int) -> Lobby:
+    lobby = Lobby()
+    for i in range(1, n + 1):
+        room = models.Room(
+            id=i,
+            name=f"pokój {i}",
+            category=random.choice(CATEGORIES),
+            max_players=5,
+            password_hash="x" if i % 10 == 0 else None,
+        )
+        lobby.room_created(room, random.randint(1, 5))
+    return lobby
+
+
+def main():
+    for n in (1_000, 10_000, 50_000, 200_000):
+        lobby = build(n)
+        number = 100_000
+        t = timeit.timeit(lambda lobby=lobby: lobby.pick_open_room("Sport"), number=number)
+        print(f"{n:8d} pokoi   {t / number * 1e6:6.2f} µs/wybór")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Mikro-benchmark serializacji odpowiedzi: plansza 25 pól i chat 1000 wiadomości.
+
+Porównuje dotychczasową ścieżkę (model Pydantic per wiersz + walidacja przez
+response_model + JSON) z FastJSONResponse (słowniki + orjson).
+
+Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_serialization
+"""
+from datetime import datetime, timedelta
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app import schemas
+from app.serialization import FastJSONResponse, format_timestamp
+
+BOARD_SIZE = 25
+CHAT_SIZE = 1000
+# typowy stan czatu: niewiele unikalnych minut, ciągle te same odpytania
+CHAT_MINUTES = 120
+
+BOARD_ADAPTER = TypeAdapter(list[schemas.TaskOut])
+CHAT_ADAPTER = TypeAdapter(list[schemas.MessageOut])
+
+
+def board_rows():
+    return [
+        (i, f"Zadanie numer {i}", (i % 3) or None, "#2563eb" if i % 3 else None)
+        for i in range(1, BOARD_SIZE + 1)
+    ]
+
+
+def chat_rows():
+    start = datetime(2025, 1, 1, 12, 0)
+    return [
+        (i, i % 5 + 1, f"gracz{i % 5}", f"wiadomość {i}", start + timedelta(minutes=i % CHAT_MINUTES))
+        for i in range(1, CHAT_SIZE + 1)
+    ]
+
+
+def board_pydantic(rows):
+    out = [
+        schemas.TaskOut(assignment_id=a, description=d, finished_by=f, color=c)
+        for a, d, f, c in rows
+    ]
+    # FastAPI: walidacja względem response_model, potem jsonable_encoder + json
+    validated = BOARD_ADAPTER.validate_python(out, from_attributes=True)
+    return FastJSONResponse(jsonable_encoder(validated)).body
+
+
+def board_fast(rows):
+    return FastJSONResponse(
+        [
+            {"assignment_id": a, "description": d, "finished_by": f, "color": c}
+            for a, d, f, c in rows
+        ]
+    ).body
+
+
+def chat_pydantic(rows):
+    out = [
+        schemas.MessageOut(id=i, user_id=u, username=n, content=t, created_at=dt)
+        for i, u, n, t, dt in rows
+    ]
+    validated = CHAT_ADAPTER.validate_python(out, from_attributes=True)
+    return FastJSONResponse(jsonable_encoder(validated)).body
+
+
+def chat_fast(rows):
+    return FastJSONResponse(
+        [
+            {
+                "id": i,
+                "user_id": u,
+                "username": n,
+                "content": t,
+                "created_at": format_timestamp(dt),
+            }
+            for i, u, n, t, dt in rows
+        ]
+    ).body
+
+
+def run(name, fn, rows, number):
+    per_call = timeit.timeit(lambda: fn(rows), number=number) / number
+    print(f"{name:<20} {per_call * 1e6:10.1f} µs/req   {len(fn(rows)):8d} B")
+
+
+def main():
+    board = board_rows()
+    chat = chat_rows()
+
+    print(f"plansza {BOARD_SIZE} pól")
+    run("pydantic", board_pydantic, board, 2000)
+    run("fast", board_fast, board, 2000)
+
+    print(f"chat {CHAT_SIZE} wiadomości")
+    run("pydantic", chat_pydantic, chat, 50)
+    run("fast", chat_fast, chat, 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Czas do gotowości workera i opóźnienie pierwszych żądań po starcie.
+
+Na kopii bazy: pierwszy start zakłada konto i pokój, potem serwer jest
+restartowany i mierzymy czas od uruchomienia procesu do 200 z /readyz oraz
+pierwsze i drugie wywołanie endpointów, które odpytuje aplikacja.
+
+Uruchomienie (z katalogu bingo-backend):
+    python -m bench.bench_startup
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .bench_concurrency import BACKEND_DIR
+
+
+def _start(workdir: str, port: int) -> tuple[subprocess.Popen, float]:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--app-dir", BACKEND_DIR, "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=workdir,
+    )
+    url = f"http://127.0.0.1:{port}/readyz"
+    while True:
+        try:
+            if httpx.get(url, timeout=0.5).status_code == 200:
+                return proc, time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    url = f"http://127.0.0.1:{args.port}"
+
+    workdir = tempfile.mkdtemp(prefix="bingo-startup-")
+    src_db = os.path.join(BACKEND_DIR, "bingo.db")
+    if os.path.exists(src_db):
+        shutil.copy(src_db, os.path.join(workdir, "bingo.db"))
+    try:
+        proc, ready = _start(workdir, args.port)
+        print(f"start na kopii bazy (migracja schematu): {ready * 1000:7.1f} ms")
+        with httpx.Client(base_url=url) as client:
+            body = {"email": "startup@example.com", "password": "bench"}
+            client.post("/auth/register", json={**body, "username": "startup"})
+            token = client.post("/auth/login", json=body).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            room_id = client.post(
+                "/rooms", json={"name": "startup", "category": "Nauka"}, headers=headers
+            ).json()["id"]
+        _stop(proc)
+
+        proc, ready = _start(workdir, args.port)
+        print(f"ponowny start (schemat gotowy):       {ready * 1000:7.1f} ms")
+        paths = ("/rooms", f"/rooms/{room_id}/tasks", f"/rooms/{room_id}/state",
+                 f"/rooms/{room_id}/messages")
+        with httpx.Client(base_url=url, headers=headers) as client:
+            for path in paths:
+                times = []
+                for _ in range(2):
+                    t = time.perf_counter()
+                    client.get(path)
+                    times.append((time.perf_counter() - t) * 1000)
+                print(f"  {path:24s} pierwsze {times[0]:6.1f} ms   drugie {times[1]:6.1f} ms")
+        _stop(proc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
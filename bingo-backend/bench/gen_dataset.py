@@ -0,0 +1,284 @@
+"""
+Generator dużego, realistycznego zbioru danych do testów skali.
+
+Schemat pochodzi z app/models.py (create_all + seed zadań), dane są wstawiane
+paczkami przez Core insert (executemany), a na Postgresie przez COPY. Id są
+nadawane po kolei przez generator, więc klucze obce nie wymagają odczytów.
+
+Rozkład danych:
+- pokoje w czasie (ostatni rok), ~90% zakończonych, 10% z hasłem,
+- 1..max_players graczy na pokój (właściciel zawsze), kolory jak w allocate_seat,
+- 25 pól na pokój z kategorii pokoju, część przejęta przez graczy,
+- wiadomości po kolei w czasie, w pokojach aktywnych w danym okresie
+  (kilka "gorących" pokoi z tysiącami wiadomości), autor zawsze z pokoju.
+
+Uruchomienie (z katalogu bingo-backend; nigdy na bazie z repo):
+    python -m bench.gen_dataset --scale small --url sqlite:///./scale-small.db
+    python -m bench.gen_dataset --users 1000000 --rooms 500000 --messages 50000000 \\
+        --url postgresql://bingo@localhost/bingo_scale
+"""
+import argparse
+import array
+import csv
+from datetime import datetime, timedelta
+import io
+import os
+import random
+import time
+
+from sqlalchemy import create_engine, event, select, text
+
+from app import models
+from app.db import Base
+from app.search import ensure_search_index
+from app.security import hash_password
+
+SCALES = {
+    # users, rooms, messages
+    "small": (10_000, 5_000, 500_000),
+    "medium": (100_000, 50_000, 5_000_000),
+    "full": (1_000_000, 500_000, 50_000_000),
+}
+BOARD_TILES = 25
+MAX_PLAYERS = 5
+PLAYER_COLORS = ["#e11d48", "#2563eb", "#22c55e", "#a855f7", "#f97316"]
+WORDS = (
+    "bingo gol mecz karny atom fizyka piłka wynik sędzia nauka tabela sport "
+    "chemia bieg rower pływanie trening zadanie pole wygrana remis kolejka "
+    "hej siema dzięki super nie tak może jutro dzisiaj szybko wolno brawo"
+).split()
+SENTENCE_POOL = 10_000
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Loader:
+    def __init__(self, url: str, batch: int):
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, connect_args=connect_args, future=True)
+        self.dialect = self.engine.dialect.name
+        self.batch = batch
+        if self.dialect == "sqlite":
+            event.listen(self.engine, "connect", _sqlite_bulk_pragmas)
+
+    def load(self, table, columns: list[str], rows) -> int:
+        start = time.perf_counter()
+        n = 0
+        # insert z modelu skompilowany raz; paczki krotek idą prosto do executemany
+        insert = table.insert().compile(dialect=self.engine.dialect, column_keys=columns)
+        sql = str(insert)
+        with self.engine.begin() as conn:
+            for batch in _batches(rows, self.batch):
+                if self.dialect == "postgresql":
+                    self._copy(conn, table, columns, batch)
+                else:
+                    conn.exec_driver_sql(sql, batch)
+                n += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"  {table.name:12s} {n:>12,d} wierszy  {elapsed:7.1f} s  ({n / max(elapsed, 1e-9):,.0f}/s)")
+        return n
+
+    @staticmethod
+    def _copy(conn, table, columns, batch):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in batch:
+            writer.writerow(["" if v is None else v for v in row])
+        buf.seek(0)
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+
+    def fix_sequences(self, tables) -> None:
+        # id nadawaliśmy sami – sekwencje Postgresa trzeba przesunąć
+        if self.dialect != "postgresql":
+            return
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                    )
+                )
+
+
+def _ts(dt: datetime) -> str:
+    # format, w którym SQLAlchemy zapisuje DateTime w SQLite (i który łyka COPY)
+    return dt.isoformat(" ", "microseconds")
+
+
+def _sqlite_bulk_pragmas(dbapi_conn, _record):
+    # tylko na czas generowania – baza do testów, nie produkcja
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=MEMORY")
+    cur.execute("PRAGMA synchronous=OFF")
+    cur.execute("PRAGMA cache_size=-262144")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+
+class Dataset:
+    def __init__(self, users: int, rooms: int, messages: int, seed: int):
+        self.n_users = users
+        self.n_rooms = rooms
+        self.n_messages = messages
+        self.rng = random.Random(seed)
+        self.now = datetime(2026, 1, 1)
+        self.start = self.now - timedelta(days=365)
+        # członkowie pokoju r: members[(r-1)*MAX_PLAYERS : r*MAX_PLAYERS], 0 = wolne
+        self.members = array.array("i", bytes(4 * MAX_PLAYERS * rooms))
+        self.room_category: list[str] = []
+        self.room_done: list[bool] = []
+
+    def _room_time(self, room_id: int) -> str:
+        return _ts(self.start + (self.now - self.start) * (room_id / self.n_rooms))
+
+    def users(self, password_hash: str):
+        rng = self.rng
+        for uid in range(1, self.n_users + 1):
+            played = int(rng.expovariate(1 / 8))
+            yield (uid, f"user{uid}@example.com", password_hash, f"gracz{uid}",
+                   played, rng.randint(0, played))
+
+    def rooms(self, password_hash: str):
+        rng = self.rng
+        for rid in range(1, self.n_rooms + 1):
+            category = rng.choice(("Nauka", "Sport"))
+            max_players = rng.randint(2, MAX_PLAYERS)
+            owner = rng.randint(1, self.n_users)
+            others = rng.sample(range(1, self.n_users + 1), rng.randint(0, max_players - 1))
+            players = [owner] + [u for u in others if u != owner]
+            base = (rid - 1) * MAX_PLAYERS
+            for i, uid in enumerate(players):
+                self.members[base + i] = uid
+            # świeże pokoje częściej jeszcze trwają
+            done = rng.random() < (0.95 if rid < self.n_rooms * 0.9 else 0.4)
+            self.room_category.append(category)
+            self.room_done.append(done)
+            yield (
+                rid, f"Pokój {rid}", password_hash if rng.random() < 0.1 else None,
+                category, max_players, self._room_time(rid), done,
+                rng.choice(players) if done else None, owner,
+            )
+
+    def room_members(self):
+        mid = 0
+        for rid in range(1, self.n_rooms + 1):
+            base = (rid - 1) * MAX_PLAYERS
+            joined = self._room_time(rid)
+            for i in range(MAX_PLAYERS):
+                uid = self.members[base + i]
+                if not uid:
+                    break
+                mid += 1
+                yield (mid, rid, uid, joined, PLAYER_COLORS[i])
+
+    def assignments(self, task_ids: dict[str, list[int]]):
+        rng = self.rng
+        aid = 0
+        for rid in range(1, self.n_rooms + 1):
+            base = (rid - 1) * MAX_PLAYERS
+            players = [u for u in self.members[base:base + MAX_PLAYERS] if u]
+            claimed = 0.6 if self.room_done[rid - 1] else 0.25
+            for task_id in rng.sample(task_ids[self.room_category[rid - 1]], BOARD_TILES):
+                aid += 1
+                uid = rng.choice(players) if rng.random() < claimed else None
+                yield (aid, uid, task_id, rid)
+
+    def messages(self):
+        rng = self.rng
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(1, 12))) for _ in range(SENTENCE_POOL)]
+        span = self.now - self.start
+        # aktywne pokoje to te założone niedawno względem chwili wiadomości
+        window = max(1.0, self.n_rooms / 200)
+        for mid in range(1, self.n_messages + 1):
+            pos = mid / self.n_messages
+            if rng.random() < 0.05:
+                # kilka "gorących" pokoi zbiera dużą część ruchu
+                rid = rng.randint(1, min(self.n_rooms, 20))
+            else:
+                rid = int(pos * self.n_rooms - abs(rng.gauss(0, window)))
+                rid = min(self.n_rooms, max(1, rid))
+            base = (rid - 1) * MAX_PLAYERS
+            players = [u for u in self.members[base:base + MAX_PLAYERS] if u]
+            yield (mid, rid, rng.choice(players), rng.choice(sentences), _ts(self.start + span * pos))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True, help="np. sqlite:///./scale.db")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--rooms", type=int)
+    parser.add_argument("--messages", type=int)
+    parser.add_argument("--batch", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-search-index", action="store_true",
+                        help="pomiń budowę FTS (przy 50M wiadomości trwa najdłużej)")
+    args = parser.parse_args()
+
+    users, rooms, messages = SCALES[args.scale]
+    users = args.users or users
+    rooms = args.rooms or rooms
+    messages = args.messages or messages
+
+    if args.url.startswith("sqlite:///"):
+        path = args.url[len("sqlite:///"):]
+        if os.path.exists(path):
+            parser.error(f"{path} już istnieje – generator tworzy bazę od zera")
+
+    loader = Loader(args.url, args.batch)
+    start = time.perf_counter()
+    # schemat i seed zadań prosto z modeli; indeks FTS dopiero po danych
+    Base.metadata.create_all(bind=loader.engine)
+    with loader.engine.connect() as conn:
+        task_ids: dict[str, list[int]] = {}
+        for task_id, category in conn.execute(select(models.Task.id, models.Task.category)):
+            task_ids.setdefault(category, []).append(task_id)
+
+    print(f"{users:,} użytkowników, {rooms:,} pokoi, {messages:,} wiadomości -> {args.url}")
+    data = Dataset(users, rooms, messages, args.seed)
+    # jeden hash dla wszystkich – PBKDF2 per wiersz trwałby godzinami
+    pw = hash_password("bench")
+
+    loader.load(models.User.__table__,
+                ["id", "email", "password_hash", "username", "games_played", "games_won"],
+                data.users(pw))
+    loader.load(models.Room.__table__,
+                ["id", "name", "password_hash", "category", "max_players", "created_at",
+                 "done", "winner_uid", "owner_id"],
+                data.rooms(pw))
+    loader.load(models.RoomMember.__table__,
+                ["id", "room_id", "user_id", "joined_at", "color"], data.room_members())
+    loader.load(models.TaskAssignment.__table__,
+                ["id", "finishing_uid", "task_id", "room_id"], data.assignments(task_ids))
+    loader.load(models.Message.__table__,
+                ["id", "room_id", "user_id", "content", "created_at"], data.messages())
+    loader.fix_sequences([models.User.__table__, models.Room.__table__,
+                          models.RoomMember.__table__, models.TaskAssignment.__table__,
+                          models.Message.__table__])
+
+    if not args.no_search_index:
+        t = time.perf_counter()
+        with loader.engine.begin() as conn:
+            ensure_search_index(conn)
+        print(f"  indeks wyszukiwania {time.perf_counter() - t:7.1f} s")
+
+    with loader.engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"gotowe w {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
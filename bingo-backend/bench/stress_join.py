@@ -0,0 +1,123 @@
+"""
+Test obciążeniowy równoległego dołączania do pokoi.
+
+Wielu graczy naraz wysyła POST /rooms/{id}/join do kilku tych samych pokoi
+(z powtórzeniami), po czym sprawdzamy w bazie niezmienniki:
+  * żaden pokój nie ma więcej członków niż max_players,
+  * w żadnym pokoju kolor się nie powtarza i każdy gracz ma kolor,
+  * nikt nie jest członkiem tego samego pokoju dwa razy.
+
+Wymaga httpx. Uruchomienie (z katalogu bingo-backend):
+    python -m bench.stress_join
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+
+import httpx
+
+from .bench_concurrency import _spawn_server
+
+
+async def _user(client: httpx.AsyncClient, i: int) -> dict:
+    email = f"stress-{i}-{random.randrange(1 << 30)}@example.com"
+    await client.post("/auth/register", json={"email": email, "password": "pw"})
+    r = await client.post("/auth/login", json={"email": email, "password": "pw"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def run(url: str, users: int, rooms: int, attempts: int) -> list[int]:
+    limits = httpx.Limits(max_connections=users * attempts)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        owners = [await _user(client, -i - 1) for i in range(rooms)]
+        room_ids = []
+        for h in owners:
+            r = await client.post(
+                "/rooms", json={"name": "stress", "category": "Nauka"}, headers=h
+            )
+            room_ids.append(r.json()["id"])
+
+        players = await asyncio.gather(*(_user(client, i) for i in range(users)))
+
+        # każdy gracz kilka razy (także do tego samego pokoju) – wszystko naraz
+        jobs = [
+            client.post(f"/rooms/{random.choice(room_ids)}/join", json={}, headers=h)
+            for h in players
+            for _ in range(attempts)
+        ]
+        statuses: dict[int, int] = {}
+        for r in await asyncio.gather(*jobs):
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+        print("odpowiedzi:", dict(sorted(statuses.items())))
+    return room_ids
+
+
+def check(db_path: str, room_ids: list[int]) -> bool:
+    con = sqlite3.connect(db_path)
+    marks = ",".join("?" * len(room_ids))
+    overfull = con.execute(
+        f"""
+        SELECT r.id, COUNT(m.id), r.max_players FROM rooms r
+        JOIN room_members m ON m.room_id = r.id
+        WHERE r.id IN ({marks})
+        GROUP BY r.id HAVING COUNT(m.id) > r.max_players
+        """,
+        room_ids,
+    ).fetchall()
+    dup_colors = con.execute(
+        f"""
+        SELECT room_id, color, COUNT(*) FROM room_members
+        WHERE room_id IN ({marks})
+        GROUP BY room_id, color HAVING COUNT(*) > 1 OR color IS NULL
+        """,
+        room_ids,
+    ).fetchall()
+    dup_members = con.execute(
+        f"""
+        SELECT room_id, user_id, COUNT(*) FROM room_members
+        WHERE room_id IN ({marks})
+        GROUP BY room_id, user_id HAVING COUNT(*) > 1
+        """,
+        room_ids,
+    ).fetchall()
+    seats = con.execute(
+        f"SELECT COUNT(*) FROM room_members WHERE room_id IN ({marks})", room_ids
+    ).fetchone()[0]
+    con.close()
+
+    print(f"zajęte miejsca: {seats} / {len(room_ids) * 5}")
+    print("przepełnione pokoje:", overfull or "brak")
+    print("powtórzone / puste kolory:", dup_colors or "brak")
+    print("podwójne członkostwa:", dup_members or "brak")
+    return not (overfull or dup_colors or dup_members)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    proc, workdir = _spawn_server(args.port)
+    try:
+        room_ids = asyncio.run(
+            run(f"http://127.0.0.1:{args.port}", args.users, args.rooms, args.attempts)
+        )
+        ok = check(os.path.join(workdir, "bingo.db"), room_ids)
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("OK" if ok else "NARUSZONE NIEZMIENNIKI")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()